@@ -0,0 +1,38 @@
+"""Routing and map helpers for the London tube network.
+
+Importing the package is cheap: the names below are resolved lazily on
+first access, so a headless worker never loads pandas, networkx,
+matplotlib or tkinter unless it uses them.
+"""
+import importlib
+
+_EXPORTS = {
+    'StationNotFound': 'tube.network',
+    'load_data': 'tube.network',
+    'load_coordinates': 'tube.network',
+    'get_node_positions': 'tube.network',
+    'calculate_statistics': 'tube.network',
+    'find_best_route': 'tube.network',
+    'build_graph': 'tube.network',
+    'load_snapshot': 'tube.snapshot',
+    'build_snapshot': 'tube.snapshot',
+    'make_engine': 'tube.engines',
+    'ENGINES': 'tube.engines',
+    'LiveNetwork': 'tube.live',
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    try:
+        module = _EXPORTS[name]
+    except KeyError:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}') from None
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
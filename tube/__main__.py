@@ -0,0 +1,5 @@
+import sys
+
+from tube.cli import main
+
+sys.exit(main())
@@ -0,0 +1,130 @@
+"""Alternative routes: Yen's loopless k-shortest paths.
+
+One shortest-path tree is grown from the destination and reused for every
+spur search across all k iterations. Its distances are exact remaining
+costs on the full network, so they form a consistent A* heuristic once
+edges and nodes are removed. Where the tree's own path from a spur node
+avoids everything removed, that path is already optimal and no search
+runs at all.
+"""
+import heapq
+import math
+
+from tube.network import StationNotFound
+from tube.search import adjacency_lists, shortest_path_tree, unwind_path
+
+
+def _tree_walk(to_pred, node):
+    # to_pred is rooted at the target, so following it walks towards the target.
+    path = []
+    while node != -1:
+        path.append(node)
+        node = to_pred[node]
+    return path
+
+
+def _spur_search(adjacency, to_target, spur, target, banned_nodes, banned_edges):
+    dist = {spur: 0.0}
+    pred = {spur: -1}
+    settled = set()
+    heap = [(to_target[spur], spur)]
+    while heap:
+        _, u = heapq.heappop(heap)
+        if u in settled:
+            continue
+        settled.add(u)
+        if u == target:
+            return unwind_path(pred, u), dist[u]
+        d = dist[u]
+        for v, w in adjacency[u]:
+            if v in banned_nodes or (u, v) in banned_edges or v not in to_target:
+                continue
+            nd = d + w
+            if nd < dist.get(v, math.inf):
+                dist[v] = nd
+                pred[v] = u
+                heapq.heappush(heap, (nd + to_target[v], v))
+    return None, math.inf
+
+
+def k_shortest_paths(adjacency, source, target, k):
+    """Up to ``k`` loopless ``(path, cost)`` pairs from source to target, cheapest first."""
+    to_target, to_pred = shortest_path_tree(adjacency, target)
+    if source not in to_target:
+        return []
+    weight = {(u, v): w for u in range(len(adjacency)) for v, w in adjacency[u]}
+    found = [(_tree_walk(to_pred, source), to_target[source])]
+    seen = {tuple(found[0][0])}
+    candidates = []
+    while len(found) < k:
+        last = found[-1][0]
+        root_cost = 0.0
+        for j, spur in enumerate(last[:-1]):
+            root = last[:j + 1]
+            banned_edges = set()
+            for path, _ in found:
+                if path[:j + 1] == root:
+                    banned_edges.add((path[j], path[j + 1]))
+                    banned_edges.add((path[j + 1], path[j]))
+            banned_nodes = set(root[:-1])
+
+            tail = _tree_walk(to_pred, spur)
+            if not banned_nodes.intersection(tail) and not any(
+                    edge in banned_edges for edge in zip(tail, tail[1:])):
+                spur_path, spur_cost = tail, to_target[spur]
+            else:
+                spur_path, spur_cost = _spur_search(adjacency, to_target, spur, target, banned_nodes, banned_edges)
+            if spur_path is not None:
+                path = root[:-1] + spur_path
+                if tuple(path) not in seen:
+                    seen.add(tuple(path))
+                    heapq.heappush(candidates, (root_cost + spur_cost, path))
+            root_cost += weight[(spur, last[j + 1])]
+        if not candidates:
+            break
+        cost, path = heapq.heappop(candidates)
+        found.append((path, cost))
+    return found
+
+
+class AlternativeRoutes:
+    """``routes(start, end, k)`` over a snapshot, as station-name paths."""
+
+    def __init__(self, snapshot, graph=None):
+        self.snapshot = snapshot
+        self.adjacency = adjacency_lists(snapshot)
+
+    def routes(self, start_station, end_station, k=3):
+        station_id = self.snapshot.station_id
+        if start_station not in station_id or end_station not in station_id:
+            raise StationNotFound(f'{start_station} or {end_station} is not in the network')
+        stations = self.snapshot.stations
+        return [([stations[i] for i in path], cost)
+                for path, cost in k_shortest_paths(self.adjacency, station_id[start_station],
+                                                   station_id[end_station], k)]
+
+    def route(self, start_station, end_station):
+        found = self.routes(start_station, end_station, 1)
+        return found[0] if found else (None, float('inf'))
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    from tube.snapshot import load_snapshot
+
+    parser = argparse.ArgumentParser(description='Print the k shortest loopless routes between two stations.')
+    parser.add_argument('start')
+    parser.add_argument('end')
+    parser.add_argument('-k', type=int, default=3)
+    parser.add_argument('--zone', default='1')
+    args = parser.parse_args()
+
+    alternatives = AlternativeRoutes(load_snapshot(zone=args.zone))
+    start = time.perf_counter()
+    found = alternatives.routes(args.start, args.end, args.k)
+    elapsed = time.perf_counter() - start
+    for i, (path, cost) in enumerate(found, 1):
+        print(f'{i}. {cost:.2f} Kms: ' + ' -> '.join(path))
+    print(f'{len(found)} routes in {elapsed * 1e3:.1f} ms')
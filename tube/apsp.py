@@ -0,0 +1,117 @@
+"""All-pairs shortest-path table over a network snapshot.
+
+The distance and predecessor matrices are computed once with a vectorized
+Floyd-Warshall and saved next to the snapshot, so a route query becomes a
+matrix lookup plus a walk back along the predecessor row.
+"""
+import os
+import time
+
+import numpy as np
+
+from tube.snapshot import atomic_write, weight_name
+
+
+def adjacency_weights(snapshot, weight=None):
+    # Per-adjacency-entry weights; defaults to the edge distance in km.
+    edge_weight = snapshot.edge_distance if weight is None else weight
+    return np.asarray(edge_weight)[snapshot.adj_edge]
+
+
+def floyd_warshall(snapshot, weight=None):
+    n = snapshot.num_stations
+    dist = np.full((n, n), np.inf)
+    pred = np.full((n, n), -1, dtype=np.int32)
+    heads = np.repeat(np.arange(n, dtype=np.int32), np.diff(snapshot.indptr))
+    tails = np.asarray(snapshot.indices)
+    dist[heads, tails] = adjacency_weights(snapshot, weight)
+    pred[heads, tails] = heads
+    np.fill_diagonal(dist, 0.0)
+    np.fill_diagonal(pred, np.arange(n, dtype=np.int32))
+
+    for k in range(n):
+        through_k = dist[:, k, None] + dist[None, k, :]
+        better = through_k < dist
+        np.copyto(dist, through_k, where=better)
+        np.copyto(pred, np.broadcast_to(pred[k], (n, n)), where=better)
+    return dist, pred
+
+
+def table_paths(snapshot, name='distance'):
+    prefix = os.path.join(snapshot.path, f'apsp-{name}-{snapshot.source_hash[:12]}')
+    return prefix + '-dist.npy', prefix + '-pred.npy'
+
+
+def load_table(snapshot, weight=None, name=None):
+    """The cached table for ``weight``, filed under ``name`` (by default derived from the weights)."""
+    dist_path, pred_path = table_paths(snapshot, name or weight_name(weight))
+    if not (os.path.exists(dist_path) and os.path.exists(pred_path)):
+        dist, pred = floyd_warshall(snapshot, weight)
+        atomic_write(dist_path, lambda f: np.save(f, dist))
+        atomic_write(pred_path, lambda f: np.save(f, pred))
+    return np.load(dist_path, mmap_mode='r'), np.load(pred_path, mmap_mode='r')
+
+
+def reconstruct_path(pred, source, target):
+    if pred[source, target] < 0:
+        return None
+    path = [target]
+    row = pred[source]
+    while target != source:
+        target = int(row[target])
+        path.append(target)
+    path.reverse()
+    return path
+
+
+def _benchmark(snapshot, queries=2000, seed=0):
+    from tube.engines import DijkstraEngine, TableEngine
+
+    rng = np.random.default_rng(seed)
+    pairs = rng.integers(0, snapshot.num_stations, size=(queries, 2))
+    pairs = [(snapshot.stations[a], snapshot.stations[b]) for a, b in pairs]
+
+    dijkstra = DijkstraEngine(snapshot)
+    start = time.perf_counter()
+    for a, b in pairs:
+        dijkstra.route(a, b)
+    dijkstra_query = (time.perf_counter() - start) / queries
+
+    start = time.perf_counter()
+    dist, pred = floyd_warshall(snapshot)
+    build = time.perf_counter() - start
+    table = TableEngine(snapshot, table=(dist, pred))
+    start = time.perf_counter()
+    for a, b in pairs:
+        table.route(a, b)
+    table_query = (time.perf_counter() - start) / queries
+
+    print(f'Stations:             {snapshot.num_stations}')
+    print(f'Dijkstra per query:   {dijkstra_query * 1e6:.1f} us')
+    print(f'Table build:          {build * 1e3:.1f} ms')
+    print(f'Table per query:      {table_query * 1e6:.1f} us')
+    if dijkstra_query > table_query:
+        crossover = build / (dijkstra_query - table_query)
+        print(f'Table pays off after: {int(np.ceil(crossover))} queries')
+    else:
+        print('Table never pays off on this network')
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from tube.snapshot import load_snapshot
+
+    parser = argparse.ArgumentParser(description='Precompute the all-pairs route table.')
+    parser.add_argument('--zone', default='1')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='compare per-query Dijkstra against the table and report the crossover')
+    parser.add_argument('--queries', type=int, default=2000)
+    args = parser.parse_args()
+    snapshot = load_snapshot(zone=args.zone)
+    if args.benchmark:
+        _benchmark(snapshot, args.queries)
+    else:
+        dist_path, _ = table_paths(snapshot)
+        load_table(snapshot)
+        print(f'Route table written to {dist_path}')
@@ -0,0 +1,177 @@
+"""Headless batch routing over JSONL query files.
+
+Each input line is a JSON object with ``origin`` and ``destination``
+station names (any ``id`` is echoed back). Queries are read in bounded
+chunks and grouped by origin, so a single shortest-path tree answers every
+query from that origin. The groups run in a process pool and results are
+written as JSONL as they complete::
+
+    python -m tube.batch queries.jsonl -o results.jsonl --workers 4
+"""
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from tube.network import StationNotFound
+from tube.search import adjacency_lists, shortest_path_tree, tree_path
+from tube.snapshot import load_snapshot
+
+_snapshot = None
+_adjacency = None
+
+
+def _init_worker(distance_file, coordinates_file, zone):
+    global _snapshot, _adjacency
+    _snapshot = load_snapshot(distance_file, coordinates_file, zone)
+    _adjacency = adjacency_lists(_snapshot)
+
+
+def _station(name):
+    # Station id for a query's name, matched through the snapshot's NameIndex; None if unknown.
+    try:
+        return _snapshot.station_id[_snapshot.names.resolve(name)]
+    except StationNotFound:
+        return None
+
+
+def _solve_group(origin, queries):
+    stations = _snapshot.stations
+    results = []
+    source = _station(origin)
+    if source is None:
+        for line_no, query in queries:
+            results.append(_result(line_no, query, error=f'unknown station {origin!r}'))
+        return results
+
+    destinations = [_station(query['destination']) for _, query in queries]
+    dist, pred = shortest_path_tree(_adjacency, source, {i for i in destinations if i is not None})
+    for (line_no, query), target in zip(queries, destinations):
+        if target is None:
+            results.append(_result(line_no, query, error=f"unknown station {query['destination']!r}"))
+            continue
+        path = tree_path(pred, dist, target)
+        if path is None:
+            results.append(_result(line_no, query, route=None, distance=None))
+        else:
+            results.append(_result(line_no, query, route=[stations[i] for i in path], distance=dist[target]))
+    return results
+
+
+def _result(line_no, query, **fields):
+    result = {'line': line_no}
+    if 'id' in query:
+        result['id'] = query['id']
+    result['origin'] = query.get('origin')
+    result['destination'] = query.get('destination')
+    result.update(fields)
+    return result
+
+
+# The error row for a line that is not a usable query.
+QUERY_ERROR = 'expected a JSON object with string origin and destination'
+
+
+def read_queries(lines):
+    """``(line_no, query)`` per non-blank line; query is None if the line is not usable."""
+    for line_no, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            query = json.loads(line)
+        except ValueError:
+            query = None
+        if (not isinstance(query, dict) or not isinstance(query.get('origin'), str)
+                or not isinstance(query.get('destination'), str)):
+            yield line_no, None
+            continue
+        yield line_no, query
+
+
+def group_by_origin(chunk):
+    groups = {}
+    for line_no, query in chunk:
+        groups.setdefault(query['origin'], []).append((line_no, query))
+    return groups
+
+
+def run_batch(lines, out, distance_file='distance.csv', coordinates_file='stations.csv', zone='1',
+              workers=None, chunk_size=50000, max_pending=None):
+    """Route every query in ``lines`` and write JSONL results to ``out``.
+
+    Returns ``(queries, seconds)``. At most ``chunk_size`` queries are held
+    in memory while grouping and at most ``max_pending`` groups are in
+    flight; ``workers=0`` runs everything in this process.
+    """
+    start = time.perf_counter()
+    count = 0
+
+    def write(results):
+        for result in results:
+            out.write(json.dumps(result) + '\n')
+
+    queries = read_queries(lines)
+    if workers == 0:
+        _init_worker(distance_file, coordinates_file, zone)
+        submit = None
+    else:
+        # Build a cold or stale snapshot here once, not in every worker at the same time.
+        load_snapshot(distance_file, coordinates_file, zone)
+        workers = workers or os.cpu_count() or 1
+        max_pending = max_pending or workers * 4
+        executor = ProcessPoolExecutor(workers, initializer=_init_worker,
+                                       initargs=(distance_file, coordinates_file, zone))
+        submit = executor.submit
+    pending = set()
+    try:
+        while True:
+            chunk = list(itertools.islice(queries, chunk_size))
+            if not chunk:
+                break
+            count += len(chunk)
+            valid = []
+            for line_no, query in chunk:
+                if query is None:
+                    write([{'line': line_no, 'error': QUERY_ERROR}])
+                else:
+                    valid.append((line_no, query))
+            for origin, group in group_by_origin(valid).items():
+                if submit is None:
+                    write(_solve_group(origin, group))
+                    continue
+                pending.add(submit(_solve_group, origin, group))
+                if len(pending) >= max_pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        write(future.result())
+        for future in pending:
+            write(future.result())
+    finally:
+        if submit is not None:
+            executor.shutdown(cancel_futures=True)
+    return count, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Route a JSONL file of origin/destination queries.')
+    parser.add_argument('queries', help="JSONL query file, or '-' for stdin")
+    parser.add_argument('-o', '--output', default='-', help="JSONL result file, or '-' for stdout")
+    parser.add_argument('--distances', default='distance.csv')
+    parser.add_argument('--stations', default='stations.csv')
+    parser.add_argument('--zone', default='1')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (0 runs inline)')
+    parser.add_argument('--chunk-size', type=int, default=50000)
+    args = parser.parse_args()
+
+    source = sys.stdin if args.queries == '-' else open(args.queries)
+    out = sys.stdout if args.output == '-' else open(args.output, 'w')
+    with source, out:
+        count, elapsed = run_batch(source, out, args.distances, args.stations, args.zone,
+                                   args.workers, args.chunk_size)
+    print(f'{count} queries in {elapsed:.2f} s ({count / elapsed if elapsed else 0:.0f} queries/s)',
+          file=sys.stderr)
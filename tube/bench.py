@@ -0,0 +1,283 @@
+"""Benchmark suite for loading, routing, statistics and drawing.
+
+Each benchmark runs on the real distance.csv/stations.csv and on synthetic
+networks built by tiling the real one ``scale`` times (same columns, same
+lines and zones, station names suffixed by tile, a few links between
+neighbouring tiles). Results go to a JSON file; ``--compare`` checks a run
+against an earlier one and exits non-zero on a regression::
+
+    python -m tube.bench --scales 1 10 100 -o bench.json
+    python -m tube.bench --compare baseline.json bench.json --threshold 1.25
+"""
+import contextlib
+import csv
+import io
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from tube.network import (build_graph, calculate_statistics, filter_edges, find_best_route, load_coordinates,
+                          load_data)
+from tube.snapshot import source_hash
+
+BENCHMARKS = ['load_data', 'load_coordinates', 'build_edges', 'find_best_route', 'calculate_statistics',
+              'plot_map', 'show_route']
+
+# Links added between each pair of neighbouring tiles in a synthetic network.
+TILE_LINKS = 3
+
+
+def synthesize(scale, out_dir, distance_file='distance.csv', coordinates_file='stations.csv', seed=0):
+    """Write a network ``scale`` times the size of the real one; returns the two CSV paths.
+
+    The file names carry the source hash and seed, so an existing pair is
+    only reused when it was tiled from the same CSVs the same way.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    tag = f'x{scale}-{source_hash(distance_file, coordinates_file)[:12]}-s{seed}'
+    distance_out = os.path.join(out_dir, f'distance-{tag}.csv')
+    stations_out = os.path.join(out_dir, f'stations-{tag}.csv')
+    if os.path.exists(distance_out) and os.path.exists(stations_out):
+        return distance_out, stations_out
+
+    with open(coordinates_file, newline='', encoding='latin1') as f:
+        reader = csv.DictReader(f)
+        station_columns = reader.fieldnames
+        station_rows = list(reader)
+    with open(distance_file, newline='', encoding='latin1') as f:
+        reader = csv.DictReader(f)
+        distance_columns = reader.fieldnames
+        distance_rows = list(reader)
+
+    xs = np.array([float(row['OS X']) for row in station_rows])
+    ys = np.array([float(row['OS Y']) for row in station_rows])
+    lat = np.array([float(row['Latitude']) for row in station_rows])
+    lon = np.array([float(row['Longitude']) for row in station_rows])
+    width = int(math.ceil(math.sqrt(scale)))
+    step_x, step_y = np.ptp(xs) * 1.1, np.ptp(ys) * 1.1
+    step_lon, step_lat = np.ptp(lon) * 1.1, np.ptp(lat) * 1.1
+
+    def name(station, tile):
+        return station if tile == 0 else f'{station} {tile}'
+
+    rng = np.random.default_rng(seed)
+    linked = sorted({row['Station from (A)'] for row in distance_rows}
+                    & {row['Station'] for row in station_rows})
+    with open(stations_out, 'w', newline='', encoding='latin1') as f:
+        writer = csv.DictWriter(f, station_columns)
+        writer.writeheader()
+        for tile in range(scale):
+            col, row_ = tile % width, tile // width
+            for row in station_rows:
+                writer.writerow({**row, 'Station': name(row['Station'], tile),
+                                 'OS X': int(float(row['OS X']) + col * step_x),
+                                 'OS Y': int(float(row['OS Y']) + row_ * step_y),
+                                 'Longitude': float(row['Longitude']) + col * step_lon,
+                                 'Latitude': float(row['Latitude']) + row_ * step_lat})
+    with open(distance_out, 'w', newline='', encoding='latin1') as f:
+        writer = csv.DictWriter(f, distance_columns)
+        writer.writeheader()
+        for tile in range(scale):
+            for row in distance_rows:
+                writer.writerow({**row, 'Station from (A)': name(row['Station from (A)'], tile),
+                                 'Station to (B)': name(row['Station to (B)'], tile)})
+            col, row_ = tile % width, tile // width
+            for neighbour, step in ((tile + 1, step_x), (tile + width, step_y)):
+                if (neighbour == tile + 1 and col == width - 1) or neighbour >= scale:
+                    continue
+                for station in rng.choice(linked, size=TILE_LINKS, replace=False):
+                    km = round(step / 1000.0, 2)
+                    writer.writerow({**distance_rows[0], 'Line': 'District', 'Direction': 'Eastbound',
+                                     'Station from (A)': name(station, tile),
+                                     'Station to (B)': name(station, neighbour),
+                                     'Distance (Kms)': km,
+                                     distance_columns[5]: round(km * 1.5, 2),
+                                     distance_columns[6]: round(km * 1.7, 2),
+                                     distance_columns[7]: round(km * 1.6, 2)})
+    return distance_out, stations_out
+
+
+def _time(fn, repeat):
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return times, result
+
+
+def run_dataset(label, distance_file, coordinates_file, zone='all', repeat=3, queries=100,
+                benchmarks=BENCHMARKS, seed=0):
+    """Time each of ``benchmarks`` on one dataset; returns a list of result dicts."""
+    # pandas and networkx are imported lazily by tube.network; load them
+    # here so their import time is not charged to the first benchmark.
+    import networkx  # noqa: F401
+    import pandas  # noqa: F401
+
+    results = []
+    context = {}
+
+    def record(benchmark, fn, repeat=repeat, per=1):
+        times, value = _time(fn, repeat)
+        results.append({
+            'dataset': label,
+            'benchmark': benchmark,
+            'repeat': repeat,
+            'per': per,
+            'times': times,
+            'median': statistics.median(times),
+            'min': min(times),
+        })
+        return value
+
+    # Later steps need earlier results, so those are computed even when not timed.
+    def step(benchmark, fn, **kwargs):
+        if benchmark in benchmarks:
+            return record(benchmark, fn, **kwargs)
+        return fn()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        df = step('load_data', lambda: load_data(distance_file))
+        coordinates = step('load_coordinates', lambda: load_coordinates(coordinates_file, zone))
+        g = step('build_edges', lambda: build_graph(filter_edges(df, coordinates)))
+        edges = filter_edges(df, coordinates)
+        context.update(stations=g.number_of_nodes(), edges=g.number_of_edges(), rows=len(df))
+
+        if 'find_best_route' in benchmarks:
+            nodes = list(g.nodes())
+            pairs = np.random.default_rng(seed).integers(0, len(nodes), size=(queries, 2)).tolist()
+            record('find_best_route',
+                   lambda: [find_best_route(g, nodes[a], nodes[b]) for a, b in pairs], per=queries)
+        if 'calculate_statistics' in benchmarks:
+            record('calculate_statistics', lambda: calculate_statistics(edges))
+
+        if 'plot_map' in benchmarks or 'show_route' in benchmarks:
+            import matplotlib
+
+            matplotlib.use('Agg')
+            import matplotlib.pyplot as plt
+
+            from tube.network import get_node_positions
+            from tube.render import MapRenderer
+
+            pos = get_node_positions(g, coordinates)
+            stats = calculate_statistics(edges)
+
+            def plot():
+                renderer = MapRenderer(pos, edges, stats, figsize=(32, 18))
+                renderer.figure.canvas.draw()
+                return renderer
+
+            # Drawing the 100x map takes long enough that one run says enough.
+            renderer = step('plot_map', plot, repeat=repeat if len(pos) < 10000 else 1)
+            if 'show_route' in benchmarks:
+                nodes = list(g.nodes())
+                a, b = np.random.default_rng(seed).integers(0, len(nodes), size=2).tolist()
+                best_route, best_distance = find_best_route(g, nodes[a], nodes[b])
+                record('show_route', lambda: renderer.show_route(best_route, best_distance))
+            plt.close(renderer.figure)
+
+    for result in results:
+        result.update(context)
+    return results
+
+
+def _meta():
+    import matplotlib
+    import networkx
+    import pandas
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'pandas': pandas.__version__,
+        'networkx': networkx.__version__,
+        'matplotlib': matplotlib.__version__,
+    }
+
+
+def run_suite(scales=(1, 10, 100), distance_file='distance.csv', coordinates_file='stations.csv', zone='all',
+              repeat=3, queries=100, benchmarks=BENCHMARKS, synthetic_dir=os.path.join('.snapshot', 'bench')):
+    results = []
+    for scale in scales:
+        if scale == 1:
+            files, label = (distance_file, coordinates_file), 'real'
+        else:
+            files, label = synthesize(scale, synthetic_dir, distance_file, coordinates_file), f'x{scale}'
+        print(f'{label}: running {", ".join(benchmarks)}', file=sys.stderr)
+        results.extend(run_dataset(label, *files, zone=zone, repeat=repeat, queries=queries,
+                                   benchmarks=benchmarks))
+    return {'meta': _meta(), 'results': results}
+
+
+def compare(baseline, current, threshold=1.25):
+    """Rows of (dataset, benchmark, old median, new median, ratio, regressed)."""
+    old = {(r['dataset'], r['benchmark']): r for r in baseline['results']}
+    rows = []
+    for result in current['results']:
+        key = (result['dataset'], result['benchmark'])
+        if key not in old:
+            continue
+        ratio = result['median'] / old[key]['median'] if old[key]['median'] else math.inf
+        rows.append((*key, old[key]['median'], result['median'], ratio, ratio > threshold))
+    return rows
+
+
+def _print_results(report):
+    for r in report['results']:
+        per = f'  ({r["median"] / r["per"] * 1e3:.3f} ms each)' if r['per'] > 1 else ''
+        print(f'{r["dataset"]:>6s} {r["benchmark"]:22s} {r["median"] * 1e3:10.2f} ms median '
+              f'{r["min"] * 1e3:10.2f} ms min{per}')
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark loading, routing and drawing on real and scaled networks.')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--benchmarks', nargs='+', default=BENCHMARKS, choices=BENCHMARKS)
+    parser.add_argument('--distances', default='distance.csv')
+    parser.add_argument('--stations', default='stations.csv')
+    parser.add_argument('--zone', default='all')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--queries', type=int, default=100, help='route queries per find_best_route run')
+    parser.add_argument('-o', '--output', default='bench.json')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'),
+                        help='compare two result files instead of running')
+    parser.add_argument('--threshold', type=float, default=1.25, help='slowdown ratio that counts as a regression')
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            baseline = json.load(f)
+        with open(args.compare[1]) as f:
+            current = json.load(f)
+        regressions = 0
+        for dataset, benchmark, old, new, ratio, regressed in compare(baseline, current, args.threshold):
+            regressions += regressed
+            print(f'{dataset:>6s} {benchmark:22s} {old * 1e3:10.2f} -> {new * 1e3:10.2f} ms  '
+                  f'x{ratio:5.2f}{"  REGRESSION" if regressed else ""}')
+        sys.exit(1 if regressions else 0)
+
+    report = run_suite(args.scales, args.distances, args.stations, args.zone, args.repeat, args.queries,
+                       args.benchmarks)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=1)
+    _print_results(report)
+    print(f'Results written to {args.output}', file=sys.stderr)
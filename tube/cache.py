@@ -0,0 +1,146 @@
+"""Result caches for routes and rendered route images.
+
+Entries are evicted least-recently-used first, both when there are more
+than ``maxsize`` of them and when their summed weight exceeds
+``max_weight``. A cache is tied to a dataset hash and empties itself when a
+different distance.csv/stations.csv is bound to it.
+"""
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    def __init__(self, maxsize=1024, max_weight=None, weigh=None, dataset_hash=None):
+        self.maxsize = maxsize
+        self.max_weight = max_weight
+        self.weigh = weigh or (lambda value: 1)
+        self.dataset_hash = dataset_hash
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.weight = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def bind(self, dataset_hash):
+        """Tie the cache to a dataset; entries from another dataset are dropped."""
+        with self._lock:
+            if dataset_hash != self.dataset_hash:
+                self._data.clear()
+                self.weight = 0
+                self.dataset_hash = dataset_hash
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value, _ = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        weight = self.weigh(value)
+        with self._lock:
+            if key in self._data:
+                self.weight -= self._data.pop(key)[1]
+            self._data[key] = (value, weight)
+            self.weight += weight
+            while self._data and (len(self._data) > self.maxsize
+                                  or (self.max_weight is not None and self.weight > self.max_weight)):
+                _, (_, evicted) = self._data.popitem(last=False)
+                self.weight -= evicted
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.weight = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'entries': len(self._data),
+            'weight': self.weight,
+        }
+
+
+class RouteCache(LRUCache):
+    """Caches ``(best_route, best_distance)`` by (origin, destination, profile).
+
+    The network is undirected, so A->B and B->A share one entry and the
+    stored path is reversed for the opposite direction. Pass
+    ``symmetric=False`` for direction-dependent weights such as
+    time-of-day routing. An optional ``extra`` value (e.g. a LineRoute) is
+    stored alongside and reversed through its ``reversed()`` method. Weight
+    is the number of stations on the route.
+    """
+
+    def __init__(self, maxsize=1024, max_weight=None, dataset_hash=None, symmetric=True):
+        super().__init__(maxsize, max_weight, lambda value: len(value[0] or ()) + 1, dataset_hash)
+        self.symmetric = symmetric
+
+    def _key(self, origin, destination, profile):
+        if self.symmetric and destination < origin:
+            return (destination, origin, profile), True
+        return (origin, destination, profile), False
+
+    @staticmethod
+    def _flip(value):
+        best_route, best_distance, extra = value
+        if best_route is not None:
+            best_route = best_route[::-1]
+        if extra is not None:
+            extra = extra.reversed()
+        return best_route, best_distance, extra
+
+    def get_route(self, origin, destination, profile='distance', with_extra=False):
+        key, reverse = self._key(origin, destination, profile)
+        value = self.get(key)
+        if value is None:
+            return None
+        if reverse:
+            value = self._flip(value)
+        return value if with_extra else value[:2]
+
+    def put_route(self, origin, destination, profile, best_route, best_distance, extra=None):
+        key, reverse = self._key(origin, destination, profile)
+        value = (best_route, best_distance, extra)
+        self.put(key, self._flip(value) if reverse else value)
+
+
+class CachedEngine:
+    """Wraps a route engine with a RouteCache shared under ``profile``."""
+
+    def __init__(self, engine, cache, profile):
+        self.engine = engine
+        self.cache = cache
+        self.profile = profile
+        self.last_route = None
+        cache.bind(engine.snapshot.source_hash)
+
+    def route(self, start_station, end_station):
+        cached = self.cache.get_route(start_station, end_station, self.profile, with_extra=True)
+        # A hit settles no nodes; the inner engine's count is from an earlier query.
+        self.settled = 0
+        if cached is None:
+            best_route, best_distance = self.engine.route(start_station, end_station)
+            self.settled = getattr(self.engine, 'settled', None)
+            extra = getattr(self.engine, 'last_route', None)
+            self.cache.put_route(start_station, end_station, self.profile, best_route, best_distance, extra)
+            cached = best_route, best_distance, extra
+        best_route, best_distance, self.last_route = cached
+        return best_route, best_distance
+
+    def __getattr__(self, name):
+        # Other engine extras pass through.
+        return getattr(self.engine, name)
@@ -0,0 +1,198 @@
+"""Betweenness and closeness centrality per station and per segment.
+
+Both come out of the same single-source searches (Brandes' algorithm on
+the weighted graph), so one pass over the sources gives node betweenness,
+segment betweenness and closeness together. The values are normalized the
+way networkx normalizes them.
+
+The exact mode runs every station as a source, split across a process
+pool. The sampled mode uses ``k`` random sources and scales the sums up by
+``n / k``. It reports ``error_bound``, a Hoeffding bound that holds for
+every station's betweenness at once with probability ``1 - delta``.
+Results are cached next to the snapshot under its source hash::
+
+    python -m tube centrality --zone all --top 15
+    python -m tube centrality --sample 64 --map centrality.png
+"""
+import heapq
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from tube.search import adjacency_lists
+from tube.snapshot import atomic_write, load_snapshot
+
+_ARRAYS = ['betweenness', 'closeness', 'edge_u', 'edge_v', 'edge_betweenness', 'sources', 'error_bound']
+
+_adjacency = None
+_pair_index = None
+
+
+def segment_pairs(snapshot):
+    """Undirected segments as (u, v) id arrays with u < v, in CSR order."""
+    indptr = snapshot.indptr.tolist()
+    indices = snapshot.indices.tolist()
+    pairs = [(u, v) for u in range(snapshot.num_stations) for v in indices[indptr[u]:indptr[u + 1]] if u < v]
+    return np.array([u for u, _ in pairs], dtype=np.int32), np.array([v for _, v in pairs], dtype=np.int32)
+
+
+def _single_source(adjacency, source, n, betweenness, edge_betweenness, pair_index):
+    # Brandes: count shortest paths on the way out, then push dependencies
+    # back from the farthest station. Returns the settled distances.
+    dist = [math.inf] * n
+    sigma = [0.0] * n
+    preds = [[] for _ in range(n)]
+    dist[source] = 0.0
+    sigma[source] = 1.0
+    order = []
+    done = [False] * n
+    heap = [(0.0, source)]
+    while heap:
+        d, v = heapq.heappop(heap)
+        if done[v]:
+            continue
+        done[v] = True
+        order.append(v)
+        for w, weight in adjacency[v]:
+            nd = d + weight
+            if nd < dist[w]:
+                dist[w] = nd
+                sigma[w] = sigma[v]
+                preds[w] = [v]
+                heapq.heappush(heap, (nd, w))
+            elif nd == dist[w] and not done[w]:
+                sigma[w] += sigma[v]
+                preds[w].append(v)
+
+    delta = [0.0] * n
+    for w in reversed(order):
+        coefficient = (1.0 + delta[w]) / sigma[w]
+        for v in preds[w]:
+            c = sigma[v] * coefficient
+            edge_betweenness[pair_index[(v, w) if v < w else (w, v)]] += c
+            delta[v] += c
+        if w != source:
+            betweenness[w] += delta[w]
+    return [(v, dist[v]) for v in order]
+
+
+def _accumulate(adjacency, sources, n, pair_index):
+    betweenness = np.zeros(n)
+    edge_betweenness = np.zeros(len(pair_index))
+    # Per source: stations reached and their summed distance, for closeness.
+    reached = np.zeros(n)
+    total = np.zeros(n)
+    # Sampled closeness needs the sums from the sources' point of view.
+    reached_by = np.zeros(n)
+    total_from = np.zeros(n)
+    for s in sources:
+        settled = _single_source(adjacency, s, n, betweenness, edge_betweenness, pair_index)
+        reached[s] = len(settled)
+        total[s] = sum(d for _, d in settled)
+        for v, d in settled:
+            if v != s:
+                reached_by[v] += 1
+                total_from[v] += d
+    return betweenness, edge_betweenness, reached, total, reached_by, total_from
+
+
+def _init_worker(distance_file, coordinates_file, zone, out_dir):
+    global _adjacency, _pair_index
+    snapshot = load_snapshot(distance_file, coordinates_file, zone, out_dir)
+    _adjacency = adjacency_lists(snapshot)
+    edge_u, edge_v = segment_pairs(snapshot)
+    _pair_index = {(u, v): i for i, (u, v) in enumerate(zip(edge_u.tolist(), edge_v.tolist()))}
+
+
+def _solve_chunk(sources):
+    return _accumulate(_adjacency, sources, len(_adjacency), _pair_index)
+
+
+def compute_centrality(snapshot, sample=None, seed=0, workers=None, delta=0.05,
+                       distance_file='distance.csv', coordinates_file='stations.csv'):
+    """Return a dict of centrality arrays for ``snapshot``.
+
+    ``sample=None`` is exact. An integer uses that many random sources and
+    fills ``error_bound`` with the betweenness error that holds for every
+    station with probability ``1 - delta``. ``workers=0`` runs in this process.
+    """
+    n = snapshot.num_stations
+    edge_u, edge_v = segment_pairs(snapshot)
+    if sample is None or sample >= n:
+        sources = np.arange(n)
+    else:
+        sources = np.sort(np.random.default_rng(seed).choice(n, size=sample, replace=False))
+    k = len(sources)
+
+    if workers == 0 or k < 64:
+        pair_index = {(u, v): i for i, (u, v) in enumerate(zip(edge_u.tolist(), edge_v.tolist()))}
+        parts = [_accumulate(adjacency_lists(snapshot), sources.tolist(), n, pair_index)]
+    else:
+        workers = workers or os.cpu_count() or 1
+        chunks = [chunk.tolist() for chunk in np.array_split(sources, workers * 4) if len(chunk)]
+        with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                 initargs=(distance_file, coordinates_file, snapshot.zone_arg,
+                                           snapshot.path)) as executor:
+            parts = list(executor.map(_solve_chunk, chunks))
+    betweenness, edge_betweenness, reached, total, reached_by, total_from = (sum(arrays) for arrays in zip(*parts))
+
+    # networkx normalization: 1/((n-1)(n-2)) per node, 1/(n(n-1)) per edge,
+    # times n/k when only k sources were run.
+    scale = n / k
+    if n > 2:
+        betweenness = betweenness * scale / ((n - 1) * (n - 2))
+    edge_betweenness = edge_betweenness * scale / (n * (n - 1)) if n > 1 else edge_betweenness
+
+    if k == n:
+        # Wasserman-Faust closeness for graphs that are not connected.
+        with np.errstate(divide='ignore', invalid='ignore'):
+            closeness = np.where(total > 0, (reached - 1) / total * (reached - 1) / max(n - 1, 1), 0.0)
+        error_bound = 0.0
+    else:
+        # Eppstein-Wang: a station's mean distance is estimated from the
+        # sampled sources that reach it, its reach from their share of k.
+        with np.errstate(divide='ignore', invalid='ignore'):
+            reach = reached_by / k
+            closeness = np.where(total_from > 0, reach * reached_by / total_from, 0.0)
+        # Hoeffding over k samples, union bound over n stations; a single
+        # source adds at most n/(n-1) to a normalized betweenness.
+        error_bound = n / max(n - 1, 1) * math.sqrt(math.log(2 * n / delta) / (2 * k))
+
+    return {
+        'betweenness': betweenness,
+        'closeness': closeness,
+        'edge_u': edge_u,
+        'edge_v': edge_v,
+        'edge_betweenness': edge_betweenness,
+        'sources': np.array(k),
+        'error_bound': np.array(error_bound),
+    }
+
+
+def centrality_path(snapshot, sample=None, seed=0):
+    mode = 'exact' if sample is None or sample >= snapshot.num_stations else f'sample{sample}-seed{seed}'
+    return os.path.join(snapshot.path, f'centrality-{mode}-{snapshot.source_hash[:12]}.npz')
+
+
+def load_centrality(snapshot, sample=None, seed=0, workers=None,
+                    distance_file='distance.csv', coordinates_file='stations.csv'):
+    """``compute_centrality`` cached per dataset hash next to the snapshot."""
+    path = centrality_path(snapshot, sample, seed)
+    if os.path.exists(path):
+        with np.load(path) as data:
+            return {key: data[key] for key in _ARRAYS}
+    result = compute_centrality(snapshot, sample, seed, workers,
+                                distance_file=distance_file, coordinates_file=coordinates_file)
+    atomic_write(path, lambda f: np.savez(f, **result))
+    return result
+
+
+def node_sizes(values, smallest=20.0, largest=600.0):
+    """Scatter marker areas proportional to ``values``."""
+    values = np.asarray(values, dtype=float)
+    top = values.max() if len(values) else 0.0
+    if top <= 0:
+        return np.full(len(values), smallest)
+    return smallest + (largest - smallest) * values / top
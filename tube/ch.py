@@ -0,0 +1,298 @@
+"""Contraction hierarchy over the station graph.
+
+``build_hierarchy`` contracts stations one at a time, least important
+first, adding a shortcut wherever removing a station would lengthen a
+shortest path between two of its neighbours. The result is stored as an
+"upward" CSR graph (each station's edges to higher-ranked stations) next
+to the snapshot. A query then only searches upwards from both ends and
+meets at the top, which settles a handful of nodes even on the full
+network, and shortcuts are unpacked back into real stations through the
+contracted middle node they record.
+
+    python -m tube.ch --zone all --check
+"""
+import heapq
+import math
+import os
+
+import numpy as np
+
+from tube.network import StationNotFound
+from tube.snapshot import atomic_write, weight_name
+
+NO_MIDDLE = -1
+
+_ARRAYS = ['rank', 'up_indptr', 'up_indices', 'up_weight', 'up_middle']
+
+
+def _witness_distances(adj, contracted, source, skip, max_cost, targets, limit):
+    # Dijkstra from source that ignores the node being contracted and gives
+    # up past max_cost or after settling limit nodes. Missing a witness only
+    # adds a redundant shortcut, never a wrong answer.
+    dist = {source: 0.0}
+    heap = [(0.0, source)]
+    settled = 0
+    remaining = set(targets)
+    while heap and remaining and settled < limit:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        if d > max_cost:
+            break
+        settled += 1
+        remaining.discard(u)
+        for v, (w, _) in adj[u].items():
+            if v == skip or contracted[v]:
+                continue
+            nd = d + w
+            if nd < dist.get(v, math.inf):
+                dist[v] = nd
+                heapq.heappush(heap, (nd, v))
+    return dist
+
+
+def _shortcuts(adj, contracted, v, limit):
+    neighbours = [(u, w) for u, (w, _) in adj[v].items() if not contracted[u]]
+    shortcuts = []
+    for i, (u, wu) in enumerate(neighbours):
+        targets = {x: wu + wx for x, wx in neighbours[i + 1:]}
+        if not targets:
+            continue
+        dist = _witness_distances(adj, contracted, u, v, max(targets.values()), targets, limit)
+        for x, cost in targets.items():
+            if dist.get(x, math.inf) > cost:
+                shortcuts.append((u, x, cost))
+    return shortcuts, len(neighbours)
+
+
+def build_hierarchy(snapshot, weight=None, witness_limit=200):
+    n = snapshot.num_stations
+    edge_weight = np.asarray(snapshot.edge_distance if weight is None else weight)
+    indptr = snapshot.indptr.tolist()
+    indices = snapshot.indices.tolist()
+    weights = edge_weight[np.asarray(snapshot.adj_edge)].tolist()
+
+    # adj[u][v] = (weight, middle); middle is the contracted node a shortcut bypasses.
+    adj = [dict() for _ in range(n)]
+    for u in range(n):
+        for k in range(indptr[u], indptr[u + 1]):
+            v, w = indices[k], weights[k]
+            if v != u and w < adj[u].get(v, (math.inf, NO_MIDDLE))[0]:
+                adj[u][v] = (w, NO_MIDDLE)
+
+    contracted = [False] * n
+    deleted_neighbours = [0] * n
+    rank = [0] * n
+
+    def priority(v):
+        shortcuts, degree = _shortcuts(adj, contracted, v, witness_limit)
+        return len(shortcuts) - degree + deleted_neighbours[v], shortcuts
+
+    heap = [(priority(v)[0], v) for v in range(n)]
+    heapq.heapify(heap)
+    order = 0
+    while heap:
+        _, v = heapq.heappop(heap)
+        if contracted[v]:
+            continue
+        # Lazy update: re-evaluate and put back if v is no longer the cheapest.
+        prio, shortcuts = priority(v)
+        if heap and prio > heap[0][0]:
+            heapq.heappush(heap, (prio, v))
+            continue
+        for u, x, cost in shortcuts:
+            if cost < adj[u].get(x, (math.inf, NO_MIDDLE))[0]:
+                adj[u][x] = (cost, v)
+                adj[x][u] = (cost, v)
+        contracted[v] = True
+        rank[v] = order
+        order += 1
+        for u in adj[v]:
+            if not contracted[u]:
+                deleted_neighbours[u] += 1
+
+    up = [sorted((x, w, m) for x, (w, m) in adj[u].items() if rank[x] > rank[u]) for u in range(n)]
+    up_indptr = np.zeros(n + 1, dtype=np.int32)
+    np.cumsum([len(edges) for edges in up], out=up_indptr[1:])
+    flat = [edge for edges in up for edge in edges]
+    return {
+        'rank': np.array(rank, dtype=np.int32),
+        'up_indptr': up_indptr,
+        'up_indices': np.array([x for x, _, _ in flat], dtype=np.int32),
+        'up_weight': np.array([w for _, w, _ in flat], dtype=np.float64),
+        'up_middle': np.array([m for _, _, m in flat], dtype=np.int32),
+    }
+
+
+def hierarchy_path(snapshot, name='distance'):
+    return os.path.join(snapshot.path, f'ch-{name}-{snapshot.source_hash[:12]}.npz')
+
+
+def load_hierarchy(snapshot, weight=None, name=None):
+    """The cached hierarchy for ``weight``, filed under ``name`` (by default derived from the weights)."""
+    path = hierarchy_path(snapshot, name or weight_name(weight))
+    if os.path.exists(path):
+        with np.load(path) as data:
+            arrays = {key: data[key] for key in _ARRAYS}
+    else:
+        arrays = build_hierarchy(snapshot, weight)
+        atomic_write(path, lambda f: np.savez(f, **arrays))
+    return ContractionHierarchy(snapshot, arrays)
+
+
+class ContractionHierarchy:
+    """Route engine answering queries from a contraction hierarchy."""
+
+    def __init__(self, snapshot, arrays):
+        self.snapshot = snapshot
+        self.rank = arrays['rank']
+        up_indptr = arrays['up_indptr'].tolist()
+        up_indices = arrays['up_indices'].tolist()
+        up_weight = arrays['up_weight'].tolist()
+        up_middle = arrays['up_middle'].tolist()
+        self.up = [
+            [(up_indices[k], up_weight[k]) for k in range(up_indptr[u], up_indptr[u + 1])]
+            for u in range(snapshot.num_stations)
+        ]
+        self.middle = {}
+        for u in range(snapshot.num_stations):
+            for k in range(up_indptr[u], up_indptr[u + 1]):
+                self.middle[(u, up_indices[k])] = up_middle[k]
+                self.middle[(up_indices[k], u)] = up_middle[k]
+        self.settled = 0
+
+    def _unpack(self, u, v, out):
+        # Append the real stations after u on the edge u-v.
+        stack = [(u, v)]
+        while stack:
+            a, b = stack.pop()
+            m = self.middle[(a, b)]
+            if m == NO_MIDDLE:
+                out.append(b)
+            else:
+                stack.append((m, b))
+                stack.append((a, m))
+
+    def query(self, source, target):
+        """Return ``(path, distance)`` between station ids; path is None if unreachable."""
+        if source == target:
+            self.settled = 1
+            return [source], 0.0
+        dist = ({source: 0.0}, {target: 0.0})
+        pred = ({source: -1}, {target: -1})
+        heaps = ([(0.0, source)], [(0.0, target)])
+        done = (set(), set())
+        best, meet = math.inf, -1
+        side = 0
+        while heaps[0] or heaps[1]:
+            if not heaps[side]:
+                side = 1 - side
+            d, u = heapq.heappop(heaps[side])
+            if u in done[side] or d > dist[side][u]:
+                continue
+            if d >= best:
+                # Nothing left on this side can improve the meeting point.
+                heaps[side].clear()
+                side = 1 - side
+                continue
+            done[side].add(u)
+            other = dist[1 - side]
+            if u in other and d + other[u] < best:
+                best, meet = d + other[u], u
+            for v, w in self.up[u]:
+                nd = d + w
+                if nd < dist[side].get(v, math.inf):
+                    dist[side][v] = nd
+                    pred[side][v] = u
+                    heapq.heappush(heaps[side], (nd, v))
+            side = 1 - side
+        self.settled = len(done[0]) + len(done[1])
+        if meet == -1:
+            return None, math.inf
+
+        up_path = []
+        node = meet
+        while node != -1:
+            up_path.append(node)
+            node = pred[0][node]
+        up_path.reverse()
+        node = pred[1][meet]
+        while node != -1:
+            up_path.append(node)
+            node = pred[1][node]
+        path = [up_path[0]]
+        for a, b in zip(up_path, up_path[1:]):
+            self._unpack(a, b, path)
+        return path, best
+
+    def route(self, start_station, end_station):
+        station_id = self.snapshot.station_id
+        if start_station not in station_id or end_station not in station_id:
+            raise StationNotFound(f'{start_station} or {end_station} is not in the network')
+        path, distance = self.query(station_id[start_station], station_id[end_station])
+        if path is None:
+            return None, float('inf')
+        stations = self.snapshot.stations
+        return [stations[i] for i in path], distance
+
+
+def cross_check(hierarchy, pairs=None, rel_tol=1e-9):
+    """Compare the hierarchy against ``find_best_route`` on the networkx graph.
+
+    Checks every station pair unless ``pairs`` is given. Returns a list of
+    ``(start, end, expected, got)`` mismatches: a different distance, or a
+    path that is not a real walk of that length.
+    """
+    from tube.network import find_best_route
+
+    snapshot = hierarchy.snapshot
+    g = snapshot.to_graph()
+    if pairs is None:
+        pairs = [(a, b) for a in snapshot.stations for b in snapshot.stations]
+    mismatches = []
+    for start, end in pairs:
+        expected_route, expected = find_best_route(g, start, end)
+        route, got = hierarchy.route(start, end)
+        if expected_route is None or route is None:
+            if expected_route is not route:
+                mismatches.append((start, end, expected, got))
+            continue
+        walk = sum(g[a][b]['weight'] for a, b in zip(route, route[1:])) if all(
+            g.has_edge(a, b) for a, b in zip(route, route[1:])) else math.inf
+        if (route[0] != start or route[-1] != end or not math.isclose(expected, got, rel_tol=rel_tol)
+                or not math.isclose(walk, got, rel_tol=rel_tol)):
+            mismatches.append((start, end, expected, got))
+    return mismatches
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    from tube.snapshot import load_snapshot
+
+    parser = argparse.ArgumentParser(description='Build the contraction hierarchy and cross-check it.')
+    parser.add_argument('--zone', default='1')
+    parser.add_argument('--check', action='store_true', help='compare every pair against find_best_route')
+    args = parser.parse_args()
+
+    snapshot = load_snapshot(zone=args.zone)
+    start = time.perf_counter()
+    hierarchy = load_hierarchy(snapshot)
+    print(f'Hierarchy ready in {time.perf_counter() - start:.2f} s ({hierarchy_path(snapshot)})')
+
+    pairs = [(a, b) for a in snapshot.stations for b in snapshot.stations]
+    start = time.perf_counter()
+    settled = 0
+    for a, b in pairs:
+        hierarchy.route(a, b)
+        settled += hierarchy.settled
+    elapsed = time.perf_counter() - start
+    print(f'{len(pairs)} queries: {elapsed / len(pairs) * 1e6:.1f} us/query, '
+          f'{settled / len(pairs):.1f} nodes settled on average')
+    if args.check:
+        mismatches = cross_check(hierarchy, pairs)
+        for mismatch in mismatches[:20]:
+            print('MISMATCH', *mismatch)
+        print(f'Cross-check: {len(pairs) - len(mismatches)}/{len(pairs)} pairs agree')
+        raise SystemExit(1 if mismatches else 0)
@@ -0,0 +1,280 @@
+"""Command line entry point for headless use.
+
+    python -m tube route "BAKER STREET" "BANK" --engine astar
+    python -m tube reachable "BAKER STREET" 3
+    python -m tube nearest --postcode "NW1 5LJ" --to BANK
+    python -m tube centrality --top 15 --sample 64
+    python -m tube resilience --closures stations --top 10
+    python -m tube stats
+    python -m tube snapshot
+    python -m tube serve --port 8765
+    python -m tube gui
+
+Global ``--metrics json|prometheus`` turns on phase timers and counters and
+prints them (or writes ``--metrics-file``) when the command finishes;
+``route --profile out.prof`` captures a cProfile of that one query.
+
+Routing only needs numpy and the compiled snapshot (the default
+'bidirectional' engine searches its arrays); pandas, networkx, matplotlib
+and tkinter are imported by the subcommands and engines that use them.
+"""
+import argparse
+import sys
+
+
+def cmd_route(args):
+    from tube.engines import make_engine
+    from tube.metrics import profile
+    from tube.network import StationNotFound, find_best_route
+    from tube.snapshot import load_snapshot
+
+    snapshot = load_snapshot(args.distances, args.stations, args.zone)
+    engine = make_engine(args.engine, snapshot)
+    try:
+        start, end = snapshot.names.resolve(args.start), snapshot.names.resolve(args.end)
+        with profile(args.profile):
+            best_route, best_distance = find_best_route(None, start, end, engine)
+    except StationNotFound as error:
+        print(error.args[0], file=sys.stderr)
+        return 1
+    if best_route:
+        print(f"Best route from {start} to {end}:\n" + " -> ".join(best_route) + f"\nTotal distance: {best_distance:.2f} Kms")
+    else:
+        print(f"No path found from {start} to {end}")
+    return 0
+
+
+def cmd_reachable(args):
+    from tube.isochrone import Isochrones
+    from tube.network import StationNotFound
+    from tube.snapshot import load_snapshot
+
+    snapshot = load_snapshot(args.distances, args.stations, args.zone)
+    isochrones = Isochrones(snapshot)
+    try:
+        costs = isochrones.reachable(snapshot.names.resolve(args.station), args.budget, args.profile)
+    except StationNotFound as error:
+        print(error.args[0], file=sys.stderr)
+        return 1
+    unit = 'Kms' if args.profile is None else 'mins'
+    for station, cost in costs.items():
+        print(f"{cost:7.2f} {unit}  {station}")
+    return 0
+
+
+def cmd_nearest(args):
+    from tube.locate import StationLocator
+    from tube.network import StationNotFound
+    from tube.snapshot import load_snapshot
+
+    snapshot = load_snapshot(args.distances, args.stations, args.zone)
+    locator = StationLocator(snapshot, args.stations)
+    if args.os is not None:
+        starts = locator.nearest(*args.os, k=args.k)
+    elif args.latlon is not None:
+        starts = locator.nearest_latlon(*args.latlon, k=args.k)
+    else:
+        # A postcode stands for the middle of the stations sharing it (or its
+        # district), snapped to like any other point.
+        point = locator.postcode_point(args.postcode)
+        if point is None:
+            print(f"No station found for {args.postcode}", file=sys.stderr)
+            return 1
+        starts = locator.nearest(*point, k=args.k)
+    for station, metres in starts:
+        print(f"{metres:7.0f} m  {station}")
+    if args.to:
+        try:
+            end = snapshot.names.resolve(args.to)
+            best_route, track, access = locator.route_from(starts, end)
+        except StationNotFound as error:
+            print(error.args[0], file=sys.stderr)
+            return 1
+        if best_route:
+            print(f"Best route to {end}:\n" + " -> ".join(best_route)
+                  + f"\nTotal distance: {track:.2f} Kms (+ {access:.2f} Kms to the first station)")
+        else:
+            print(f"No path found to {end}")
+    return 0
+
+
+def cmd_centrality(args):
+    from tube.centrality import load_centrality
+    from tube.snapshot import load_snapshot
+
+    snapshot = load_snapshot(args.distances, args.stations, args.zone)
+    result = load_centrality(snapshot, args.sample, args.seed, args.workers, args.distances, args.stations)
+    values = result[args.measure]
+    stations = snapshot.stations
+    if result['error_bound'] > 0:
+        print(f"Sampled {int(result['sources'])} sources; betweenness within "
+              f"+/- {float(result['error_bound']):.4f} with 95% confidence")
+    for i in values.argsort()[::-1][:args.top]:
+        print(f"{values[i]:8.4f}  {stations[i]}")
+    if args.map:
+        import contextlib
+        import io
+
+        import matplotlib
+
+        matplotlib.use('Agg')
+        from tube.network import calculate_statistics, get_node_positions
+        from tube.render import MapRenderer
+
+        df = snapshot.frame()
+        with contextlib.redirect_stdout(io.StringIO()):
+            pos = get_node_positions(snapshot.to_graph(), snapshot.station_coordinates())
+            statistics = calculate_statistics(df)
+        renderer = MapRenderer(pos, df, statistics)
+        renderer.show_centrality(dict(zip(stations, values.tolist())), title=args.measure.capitalize())
+        renderer.figure.savefig(args.map)
+        print(f"Map written to {args.map}")
+    return 0
+
+
+def cmd_resilience(args):
+    import json
+
+    from tube.resilience import baseline, sweep
+    from tube.snapshot import load_snapshot
+
+    snapshot = load_snapshot(args.distances, args.stations, args.zone)
+    pairs, mean_cost = baseline(snapshot)
+    print(f"{pairs} connected station pairs, mean cost {mean_cost:.2f} Kms")
+    results = list(sweep(snapshot, args.closures, args.workers, args.distances, args.stations))
+    if args.output:
+        with open(args.output, 'w') as f:
+            for result in results:
+                f.write(json.dumps(result) + '\n')
+    results.sort(key=lambda r: (r['disconnected_pairs'], r['mean_increase']), reverse=True)
+    for r in results[:args.top]:
+        closed = r['station'] if r['closure'] == 'station' else f"{r['from']} - {r['to']}"
+        print(f"{r['disconnected_pairs']:7d} pairs cut  +{r['mean_increase']:6.3f} Kms mean  {closed}")
+    return 0
+
+
+def cmd_stats(args):
+    from tube.network import calculate_statistics
+    from tube.snapshot import load_snapshot
+
+    calculate_statistics(load_snapshot(args.distances, args.stations, args.zone).frame())
+    return 0
+
+
+def cmd_snapshot(args):
+    from tube.snapshot import build_snapshot
+
+    print(f'Snapshot written to {build_snapshot(args.distances, args.stations, args.zone)}')
+    return 0
+
+
+def cmd_serve(args):
+    import asyncio
+
+    from tube.server import RouteService, serve
+    from tube.snapshot import load_snapshot
+
+    snapshot = load_snapshot(args.distances, args.stations, args.zone)
+    service = RouteService(snapshot, args.engine, args.workers, args.distances, args.stations)
+
+    def ready(port):
+        print(f"Serving {snapshot.num_stations} stations on http://{args.host}:{port}", file=sys.stderr)
+
+    try:
+        asyncio.run(serve(service, args.host, args.port, ready))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+    return 0
+
+
+def cmd_gui(args):
+    from tube.gui import main
+
+    main(args.distances, args.stations, args.zone, metrics=args.metrics is not None)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='tube', description='London tube routing.')
+    parser.add_argument('--distances', default='distance.csv')
+    parser.add_argument('--stations', default='stations.csv')
+    parser.add_argument('--zone', default='1', help="zone label, a list such as '1,2', or 'all'")
+    parser.add_argument('--metrics', choices=['json', 'prometheus'], default=None,
+                        help='collect timers and counters and print them in this format')
+    parser.add_argument('--metrics-file', default=None, help='write the metrics here instead of stderr')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    route = commands.add_parser('route', help='print the best route between two stations')
+    route.add_argument('start')
+    route.add_argument('end')
+    route.add_argument('--engine', default='bidirectional')
+    route.add_argument('--profile', default=None, metavar='FILE', help='write a cProfile of the query to FILE')
+    route.set_defaults(func=cmd_route)
+
+    reachable = commands.add_parser('reachable', help='list the stations within a distance or time budget')
+    reachable.add_argument('station')
+    reachable.add_argument('budget', type=float, help='Kms, or minutes with --profile')
+    reachable.add_argument('--profile', default=None, choices=['unimpeded', 'am_peak', 'inter_peak'],
+                           help='budget in minutes of this running-time profile')
+    reachable.set_defaults(func=cmd_reachable)
+
+    nearest = commands.add_parser('nearest', help='snap a point or postcode to stations, optionally routing on')
+    where = nearest.add_mutually_exclusive_group(required=True)
+    where.add_argument('--os', nargs=2, type=float, metavar=('X', 'Y'), help='OS grid easting and northing')
+    where.add_argument('--latlon', nargs=2, type=float, metavar=('LAT', 'LON'))
+    where.add_argument('--postcode')
+    nearest.add_argument('-k', type=int, default=3, help='number of stations to snap to')
+    nearest.add_argument('--to', help='route from the snapped stations to this station')
+    nearest.set_defaults(func=cmd_nearest)
+
+    centrality = commands.add_parser('centrality', help='rank stations by betweenness or closeness')
+    centrality.add_argument('--measure', default='betweenness', choices=['betweenness', 'closeness'])
+    centrality.add_argument('--sample', type=int, default=None, metavar='K',
+                            help='estimate from K random sources instead of all of them')
+    centrality.add_argument('--seed', type=int, default=0)
+    centrality.add_argument('--workers', type=int, default=None, help='worker processes (0 runs inline)')
+    centrality.add_argument('--top', type=int, default=10)
+    centrality.add_argument('--map', default=None, metavar='FILE', help='save the map with stations sized by value')
+    centrality.set_defaults(func=cmd_centrality)
+
+    resilience = commands.add_parser('resilience', help='rank segments or stations by the damage closing them does')
+    resilience.add_argument('--closures', default='segments', choices=['segments', 'stations'])
+    resilience.add_argument('--workers', type=int, default=None, help='worker processes (0 runs inline)')
+    resilience.add_argument('--top', type=int, default=10)
+    resilience.add_argument('-o', '--output', default=None, help='write every result as JSONL here')
+    resilience.set_defaults(func=cmd_resilience)
+
+    commands.add_parser('stats', help='print segment length statistics').set_defaults(func=cmd_stats)
+    commands.add_parser('snapshot', help='rebuild the compiled network snapshot').set_defaults(func=cmd_snapshot)
+    serve = commands.add_parser('serve', help='answer route, distance and stats queries over HTTP/JSON')
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8765)
+    serve.add_argument('--engine', default='bidirectional')
+    serve.add_argument('--workers', type=int, default=None, help='search processes (0 searches on the event loop)')
+    serve.set_defaults(func=cmd_serve)
+
+    commands.add_parser('gui', help='open the Tkinter route finder').set_defaults(func=cmd_gui)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.metrics is None:
+        return args.func(args)
+
+    from tube.metrics import METRICS
+
+    METRICS.enable()
+    with METRICS.timer('command'):
+        status = args.func(args)
+    if args.metrics_file:
+        METRICS.dump(args.metrics_file, args.metrics)
+    else:
+        print(METRICS.to_prometheus() if args.metrics == 'prometheus' else METRICS.to_json(), file=sys.stderr)
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
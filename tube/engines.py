@@ -0,0 +1,157 @@
+"""Interchangeable route engines.
+
+Every engine answers ``route(start_station, end_station)`` with the same
+``(best_route, best_distance)`` pair as ``tube.network.find_best_route``:
+a list of station names and the distance, or ``(None, inf)`` if there is
+no path. Unknown stations raise ``StationNotFound``. Only the 'dijkstra'
+engine needs networkx, and it imports it on first use.
+"""
+from tube.apsp import load_table, reconstruct_path
+from tube.ch import load_hierarchy
+from tube.lines import DEFAULT_INTERCHANGE_COST, load_line_graph
+from tube.network import StationNotFound
+from tube.search import adjacency_lists, astar, bidirectional_dijkstra, heuristic_scale
+from tube.zones import ZonedNetwork
+
+
+class DijkstraEngine:
+    """One Dijkstra search per query on the networkx graph.
+
+    networkx does not report how many nodes a search settled, so the
+    weight function notes every node whose edges it is asked for; with the
+    target, which is settled without being expanded, that is ``settled``.
+    """
+
+    def __init__(self, snapshot, graph=None):
+        self.snapshot = snapshot
+        self.graph = graph if graph is not None else snapshot.to_graph()
+        self.settled = 0
+
+    def route(self, start_station, end_station):
+        import networkx as nx
+
+        if start_station not in self.graph or end_station not in self.graph:
+            raise StationNotFound(f'{start_station} or {end_station} is not in the network')
+        expanded = set()
+
+        def weight(u, v, data):
+            expanded.add(u)
+            return data['weight']
+
+        try:
+            best_distance, best_route = nx.single_source_dijkstra(
+                self.graph, start_station, end_station, weight=weight)
+        except nx.NetworkXNoPath:
+            self.settled = len(expanded)
+            return None, float('inf')
+        self.settled = len(expanded | {end_station})
+        return best_route, best_distance
+
+
+class TableEngine:
+    """Lookups into a precomputed all-pairs distance/predecessor table."""
+
+    def __init__(self, snapshot, graph=None, table=None):
+        self.snapshot = snapshot
+        self.dist, self.pred = table if table is not None else load_table(snapshot)
+
+    def route(self, start_station, end_station):
+        station_id = self.snapshot.station_id
+        if start_station not in station_id or end_station not in station_id:
+            raise StationNotFound(f'{start_station} or {end_station} is not in the network')
+        source, target = station_id[start_station], station_id[end_station]
+        path = reconstruct_path(self.pred, source, target)
+        if path is None:
+            return None, float('inf')
+        stations = self.snapshot.stations
+        return [stations[i] for i in path], float(self.dist[source, target])
+
+
+class _SnapshotSearchEngine:
+    """Base for engines that search the snapshot adjacency directly.
+
+    Subclasses define ``_search(source, target)``, returning ``(path,
+    distance, settled)`` over station ids. ``settled`` holds the number of
+    nodes settled by the last query.
+    """
+
+    def __init__(self, snapshot, graph=None):
+        self.snapshot = snapshot
+        self.adjacency = adjacency_lists(snapshot)
+        self.settled = 0
+
+    def route(self, start_station, end_station):
+        station_id = self.snapshot.station_id
+        if start_station not in station_id or end_station not in station_id:
+            raise StationNotFound(f'{start_station} or {end_station} is not in the network')
+        path, distance, self.settled = self._search(station_id[start_station], station_id[end_station])
+        if path is None:
+            return None, float('inf')
+        stations = self.snapshot.stations
+        return [stations[i] for i in path], distance
+
+
+class AStarEngine(_SnapshotSearchEngine):
+    """A* guided by the straight-line OS X/OS Y distance to the target."""
+
+    def __init__(self, snapshot, graph=None):
+        super().__init__(snapshot, graph)
+        self.os_x = snapshot.os_x.tolist()
+        self.os_y = snapshot.os_y.tolist()
+        self.scale = heuristic_scale(snapshot)
+
+    def _search(self, source, target):
+        return astar(self.adjacency, source, target, self.os_x, self.os_y, self.scale)
+
+
+class BidirectionalEngine(_SnapshotSearchEngine):
+    """Dijkstra from both ends, stopping once the frontiers meet."""
+
+    def _search(self, source, target):
+        return bidirectional_dijkstra(self.adjacency, source, target)
+
+
+class LineAwareEngine:
+    """Search the (station, line) graph so changing lines has a cost.
+
+    ``last_route`` keeps the ``LineRoute`` of the last query, with its line
+    legs and number of changes.
+    """
+
+    def __init__(self, snapshot, graph=None, interchange_cost=DEFAULT_INTERCHANGE_COST):
+        self.snapshot = snapshot
+        self.line_graph = load_line_graph(snapshot)
+        self.interchange_cost = interchange_cost
+        self.last_route = None
+
+    def route(self, start_station, end_station):
+        if start_station not in self.snapshot.station_id or end_station not in self.snapshot.station_id:
+            raise StationNotFound(f'{start_station} or {end_station} is not in the network')
+        self.last_route = self.line_graph.route(start_station, end_station, self.interchange_cost)
+        if self.last_route is None:
+            return None, float('inf')
+        return self.last_route.stations, self.last_route.distance
+
+
+def HierarchyEngine(snapshot, graph=None):
+    """Contraction hierarchy, loaded from disk or built on first use."""
+    return load_hierarchy(snapshot)
+
+
+ENGINES = {
+    'dijkstra': DijkstraEngine,
+    'table': TableEngine,
+    'astar': AStarEngine,
+    'bidirectional': BidirectionalEngine,
+    'lines': LineAwareEngine,
+    'zoned': ZonedNetwork,
+    'ch': HierarchyEngine,
+}
+
+
+def make_engine(name, snapshot, graph=None):
+    try:
+        engine = ENGINES[name]
+    except KeyError:
+        raise ValueError(f"Unknown route engine {name!r}, expected one of {sorted(ENGINES)}") from None
+    return engine(snapshot, graph)
@@ -0,0 +1,172 @@
+"""Headless map export for batches of routes.
+
+Reads the same JSONL queries as ``tube.batch`` and writes one image per
+query. Every worker process renders the static network once on the Agg
+backend and keeps the bitmap. For PNG output each route only restores
+that bitmap, draws the route overlay on top and writes the pixels, so the
+thousands of base artists are not redrawn per image. SVG output is vector
+and has to be drawn in full::
+
+    python -m tube.export queries.jsonl -o maps/ --format png --workers 4
+"""
+import collections
+import contextlib
+import io
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from tube.batch import QUERY_ERROR, read_queries
+from tube.network import StationNotFound
+from tube.snapshot import load_snapshot
+
+FORMATS = ('png', 'svg')
+
+_engine = None
+_names = None
+_renderer = None
+_options = None
+
+
+def _init_worker(distance_file, coordinates_file, zone, engine, figsize, dpi):
+    global _engine, _names, _renderer, _options
+    import matplotlib
+
+    matplotlib.use('Agg')
+
+    from tube.engines import make_engine
+    from tube.network import calculate_statistics, get_node_positions
+    from tube.render import MapRenderer
+
+    snapshot = load_snapshot(distance_file, coordinates_file, zone)
+    df = snapshot.frame()
+    graph = snapshot.to_graph()
+    # get_node_positions and calculate_statistics print; keep the manifest clean.
+    with contextlib.redirect_stdout(io.StringIO()):
+        pos = get_node_positions(graph, snapshot.station_coordinates())
+        statistics = calculate_statistics(df)
+    _engine = make_engine(engine, snapshot, graph)
+    _names = snapshot.names
+    _renderer = MapRenderer(pos, df, statistics, figsize=figsize)
+    _renderer.figure.set_dpi(dpi)
+    # The first full draw caches the base layer (MapRenderer._on_draw).
+    _renderer.figure.canvas.draw()
+    _options = {'dpi': dpi}
+
+
+def slug(name):
+    return re.sub(r'[^A-Za-z0-9]+', '_', name).strip('_').lower()
+
+
+def _render(job):
+    import matplotlib.image
+    import numpy as np
+
+    line_no, query, path, fmt = job
+    result = {'line': line_no}
+    if 'id' in query:
+        result['id'] = query['id']
+    result['origin'], result['destination'] = query['origin'], query['destination']
+    try:
+        start, end = _names.resolve(query['origin']), _names.resolve(query['destination'])
+        best_route, best_distance = _engine.route(start, end)
+    except StationNotFound as error:
+        result['error'] = error.args[0]
+        return result
+    _renderer.show_route(best_route, best_distance)
+    if fmt == 'png':
+        # show_route blitted the overlay onto the cached base; save those pixels.
+        matplotlib.image.imsave(path, np.asarray(_renderer.figure.canvas.buffer_rgba()), format='png',
+                                dpi=_options['dpi'])
+    else:
+        _renderer.figure.savefig(path, format=fmt, dpi=_options['dpi'])
+    result['file'] = path
+    result['distance'] = best_distance if best_route else None
+    return result
+
+
+def _unique_name(name, used):
+    # Ids that differ only in case or punctuation slug to the same file;
+    # later ones get a numeric suffix instead of overwriting the first.
+    base = slug(name) or 'route'
+    candidate, n = base, 1
+    while candidate in used:
+        n += 1
+        candidate = f'{base}-{n}'
+    used.add(candidate)
+    return candidate
+
+
+def export_routes(lines, out_dir, fmt='png', distance_file='distance.csv', coordinates_file='stations.csv',
+                  zone='1', engine='bidirectional', workers=None, figsize=(32, 18), dpi=100, max_pending=None):
+    """Render one image per JSONL query in ``lines`` into ``out_dir``.
+
+    Yields one manifest dict per query, in input order, with the written
+    ``file`` or an ``error``. Queries are read as they are rendered, with
+    at most ``max_pending`` in flight. ``workers=0`` renders in this process.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f'unknown format {fmt!r}, expected one of {FORMATS}')
+    os.makedirs(out_dir, exist_ok=True)
+    initargs = (distance_file, coordinates_file, zone, engine, figsize, dpi)
+    if workers == 0:
+        _init_worker(*initargs)
+        executor = None
+    else:
+        # Build a cold or stale snapshot here once, not in every worker at the same time.
+        load_snapshot(distance_file, coordinates_file, zone)
+        workers = workers or os.cpu_count() or 1
+        max_pending = max_pending or workers * 8
+        executor = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=initargs)
+    used = set()
+    # Results in input order: rows already known, or futures still rendering.
+    pending = collections.deque()
+    try:
+        for line_no, query in read_queries(lines):
+            if query is None:
+                pending.append({'line': line_no, 'error': QUERY_ERROR})
+            else:
+                name = query.get('id', f"{line_no:05d}-{query['origin']}-{query['destination']}")
+                job = (line_no, query, os.path.join(out_dir, f'{_unique_name(str(name), used)}.{fmt}'), fmt)
+                pending.append(_render(job) if executor is None else executor.submit(_render, job))
+            while pending and (isinstance(pending[0], dict) or len(pending) > max_pending):
+                item = pending.popleft()
+                yield item if isinstance(item, dict) else item.result()
+        while pending:
+            item = pending.popleft()
+            yield item if isinstance(item, dict) else item.result()
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description='Render a map image for every query in a JSONL file.')
+    parser.add_argument('queries', help="JSONL query file, or '-' for stdin")
+    parser.add_argument('-o', '--out-dir', default='maps')
+    parser.add_argument('--format', default='png', choices=FORMATS)
+    parser.add_argument('--distances', default='distance.csv')
+    parser.add_argument('--stations', default='stations.csv')
+    parser.add_argument('--zone', default='1')
+    parser.add_argument('--engine', default='bidirectional')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (0 renders inline)')
+    parser.add_argument('--dpi', type=int, default=100)
+    parser.add_argument('--size', type=float, nargs=2, default=(32, 18), metavar=('WIDTH', 'HEIGHT'),
+                        help='figure size in inches')
+    args = parser.parse_args()
+
+    source = sys.stdin if args.queries == '-' else open(args.queries)
+    start = time.perf_counter()
+    images = 0
+    with source:
+        for result in export_routes(source, args.out_dir, args.format, args.distances, args.stations, args.zone,
+                                    args.engine, args.workers, tuple(args.size), args.dpi):
+            images += 'file' in result
+            print(json.dumps(result))
+    elapsed = time.perf_counter() - start
+    print(f'{images} images in {elapsed:.2f} s ({images / elapsed if elapsed else 0:.1f} images/s)', file=sys.stderr)
@@ -0,0 +1,221 @@
+"""Tkinter front end: pick two stations and draw the best route on the map.
+
+matplotlib is only imported once the map is first drawn.
+"""
+import tkinter as tk
+from tkinter import ttk
+
+from tube.alternatives import AlternativeRoutes
+from tube.cache import CachedEngine, RouteCache
+from tube.engines import ENGINES, make_engine
+from tube.isochrone import Isochrones
+from tube.metrics import METRICS
+from tube.network import StationNotFound, calculate_statistics, find_best_route, get_node_positions
+from tube.snapshot import load_snapshot
+from tube.worker import BackgroundWorker
+
+
+class RouteApp:
+    def __init__(self, root, snapshot):
+        self.root = root
+        self.snapshot = snapshot
+        self.df = snapshot.frame()
+        self.g = snapshot.to_graph()
+        self.pos = get_node_positions(self.g, snapshot.station_coordinates())
+        self.statistics = calculate_statistics(self.df)
+        # Route engines are created lazily by get_engine, the map renderer by plot_map
+        self.engines = {}
+        self.route_cache = RouteCache(maxsize=4096, dataset_hash=snapshot.source_hash)
+        self.alternatives = None
+        self.isochrones = None
+        self.renderer = None
+
+        self.name_index = snapshot.names
+        root.title("Find Best Route")
+
+        tk.Label(root, text="Start Station:").grid(row=0)
+        tk.Label(root, text="End Station:").grid(row=1)
+        tk.Label(root, text="Engine:").grid(row=2)
+        tk.Label(root, text="Alternatives:").grid(row=3)
+        tk.Label(root, text="Reachable within (Kms):").grid(row=4)
+
+        # Station boxes are editable: typing narrows the list through the name index
+        self.start_station_combobox = ttk.Combobox(root, values=self.name_index.names)
+        self.end_station_combobox = ttk.Combobox(root, values=self.name_index.names)
+        self.engine_combobox = ttk.Combobox(root, values=list(ENGINES), state='readonly')
+        self.engine_combobox.set('bidirectional')
+
+        self.start_station_combobox.grid(row=0, column=1)
+        self.end_station_combobox.grid(row=1, column=1)
+        self.engine_combobox.grid(row=2, column=1)
+        self.alternatives_spinbox = ttk.Spinbox(root, from_=0, to=4, width=5, state='readonly')
+        self.alternatives_spinbox.set(0)
+        self.alternatives_spinbox.grid(row=3, column=1, sticky='w')
+        self.budget_spinbox = ttk.Spinbox(root, from_=0.5, to=50, increment=0.5, width=5)
+        self.budget_spinbox.set(3)
+        self.budget_spinbox.grid(row=4, column=1, sticky='w')
+
+        for combobox in (self.start_station_combobox, self.end_station_combobox, self.engine_combobox):
+            combobox.bind('<<ComboboxSelected>>', self.on_selection_changed)
+        for combobox in (self.start_station_combobox, self.end_station_combobox):
+            combobox.bind('<KeyRelease>', self.on_station_typed)
+
+        tk.Button(root, text="Find Route", command=self.on_find_route).grid(row=5, column=0)
+        tk.Button(root, text="Show Reachable", command=self.on_show_reachable).grid(row=5, column=1)
+
+        self.progress = ttk.Progressbar(root, mode='indeterminate', length=200)
+        self.progress.grid(row=6, column=0, columnspan=2)
+
+        self.status_label = tk.Label(root, text="")
+        self.status_label.grid(row=7, column=0, columnspan=2)
+
+        self.result_label = tk.Label(root, text="", wraplength=400)
+        self.result_label.grid(row=8, column=0, columnspan=2)
+
+        if METRICS.enabled:
+            tk.Button(root, text="Save Metrics", command=self.on_save_metrics).grid(row=9, column=0, columnspan=2)
+
+        # Routing runs on a background thread; results come back through the Tk loop
+        self.worker = BackgroundWorker(root)
+
+        # Render the static map while the window is idle so the first query only draws its route
+        root.after_idle(self.plot_map, None, float('inf'))
+
+    def get_engine(self, name):
+        # Engines are built on first use, e.g. the table engine loads or computes its matrices
+        if name not in self.engines:
+            engine = make_engine(name, self.snapshot, self.g)
+            self.engines[name] = CachedEngine(engine, self.route_cache, profile=name)
+        return self.engines[name]
+
+    def compute_route(self, start_station, end_station, engine_name, k=0):
+        # Runs on the worker thread: no Tk or matplotlib calls in here
+        engine = self.get_engine(engine_name)
+        best_route, best_distance = find_best_route(self.g, start_station, end_station, engine)
+        alternatives = []
+        if k and best_route:
+            if self.alternatives is None:
+                self.alternatives = AlternativeRoutes(self.snapshot)
+            # The engine's route is usually one of the k + 1 shortest paths, but not
+            # always the first: the lines engine adds interchange penalties.
+            alternatives = [(route, distance)
+                            for route, distance in self.alternatives.routes(start_station, end_station, k + 1)
+                            if route != best_route][:k]
+        return (start_station, end_station, best_route, best_distance,
+                getattr(engine, 'last_route', None), alternatives)
+
+    def resolve_station(self, combobox):
+        # Typed text such as 'elephant & castle' becomes the network's own name
+        station = self.name_index.resolve(combobox.get())
+        combobox.set(station)
+        return station
+
+    def on_find_route(self):
+        if not self.start_station_combobox.get() or not self.end_station_combobox.get():
+            self.status_label.config(text="Pick a start and an end station")
+            return
+        try:
+            start_station = self.resolve_station(self.start_station_combobox)
+            end_station = self.resolve_station(self.end_station_combobox)
+        except StationNotFound as error:
+            self.status_label.config(text=error.args[0])
+            return
+        self.status_label.config(text=f"Finding route from {start_station} to {end_station}...")
+        self.progress.start(10)
+        self.worker.submit(self.compute_route, start_station, end_station, self.engine_combobox.get(),
+                           int(self.alternatives_spinbox.get()), on_done=self.on_route_found, on_error=self.on_route_failed)
+
+    def on_route_found(self, result):
+        # Back on the UI thread
+        start_station, end_station, best_route, best_distance, line_route, alternatives = result
+        self.progress.stop()
+        stats = self.route_cache.stats()
+        self.status_label.config(text=f"Route cache: {stats['hits']} hits, {stats['misses']} misses")
+        if best_route:
+            text = f"Best route from {start_station} to {end_station}:\n" + " -> ".join(best_route) + f"\nTotal distance: {best_distance:.2f} Kms"
+            if line_route is not None:
+                legs = [f"{line.strip()}: {leg[0]} -> {leg[-1]}" for line, leg in line_route.legs]
+                text += f"\nChanges: {line_route.changes}\n" + "\n".join(legs)
+            for i, (route, distance) in enumerate(alternatives, 1):
+                text += f"\nAlternative {i} ({distance:.2f} Kms): " + " -> ".join(route)
+            self.result_label.config(text=text)
+        else:
+            self.result_label.config(text=f"No path found from {start_station} to {end_station}")
+        self.plot_map(best_route, best_distance, alternatives)
+
+    def compute_reachable(self, station, budget):
+        # Runs on the worker thread
+        if self.isochrones is None:
+            self.isochrones = Isochrones(self.snapshot)
+        return station, budget, self.isochrones.reachable(station, budget)
+
+    def on_show_reachable(self):
+        try:
+            budget = float(self.budget_spinbox.get())
+        except ValueError:
+            budget = None
+        if not self.start_station_combobox.get() or not budget or budget <= 0:
+            self.status_label.config(text="Pick a start station and a positive distance")
+            return
+        try:
+            station = self.resolve_station(self.start_station_combobox)
+        except StationNotFound as error:
+            self.status_label.config(text=error.args[0])
+            return
+        self.status_label.config(text=f"Finding stations within {budget:g} Kms of {station}...")
+        self.progress.start(10)
+        self.worker.submit(self.compute_reachable, station, budget,
+                           on_done=self.on_reachable_found, on_error=self.on_route_failed)
+
+    def on_reachable_found(self, result):
+        station, budget, costs = result
+        self.progress.stop()
+        self.status_label.config(text="")
+        self.result_label.config(text=f"{len(costs)} stations within {budget:g} Kms of {station}")
+        self.plot_map(None, float('inf'))
+        self.renderer.show_isochrone(costs, budget)
+
+    def on_route_failed(self, error):
+        self.progress.stop()
+        self.status_label.config(text=f"Route failed: {error}")
+
+    def on_station_typed(self, event):
+        if event.keysym in ('Up', 'Down', 'Return', 'Escape', 'Tab'):
+            return
+        event.widget['values'] = self.name_index.complete(event.widget.get())
+        self.on_selection_changed(event)
+
+    def on_save_metrics(self):
+        METRICS.dump('tube-metrics.json', 'json')
+        METRICS.dump('tube-metrics.prom', 'prometheus')
+        self.status_label.config(text="Metrics saved to tube-metrics.json and tube-metrics.prom")
+
+    def on_selection_changed(self, event):
+        # A new station choice makes any query still in flight stale
+        if self.worker.busy:
+            self.worker.cancel()
+            self.progress.stop()
+            self.status_label.config(text="")
+
+    def plot_map(self, best_route, best_distance, alternatives=()):
+        # The static network is rendered once; later queries only swap the route overlay
+        if self.renderer is None:
+            import matplotlib.pyplot as plt
+            from tube.render import MapRenderer
+
+            self.renderer = MapRenderer(self.pos, self.df, self.statistics)
+            plt.show(block=False)
+        self.renderer.show_route(best_route, best_distance, alternatives)
+
+
+def main(distance_file='distance.csv', coordinates_file='stations.csv', zone='1', metrics=False):
+    if metrics:
+        METRICS.enable()
+    snapshot = load_snapshot(distance_file, coordinates_file, zone)
+    root = tk.Tk()
+    RouteApp(root, snapshot)
+    root.mainloop()
+
+
+if __name__ == '__main__':
+    main()
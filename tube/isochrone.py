@@ -0,0 +1,42 @@
+"""Reachability: every station within a distance or travel-time budget.
+
+One single-source search from the origin answers the whole query. It stops
+as soon as the next station would cost more than the budget, so small
+budgets only touch the neighbourhood of the origin.
+"""
+import numpy as np
+
+from tube.network import StationNotFound
+from tube.search import adjacency_lists, shortest_path_tree
+from tube.timetable import PROFILES
+
+
+class Isochrones:
+    """``reachable(station, budget, profile=None)`` over a snapshot.
+
+    Without a profile the budget is in km of track; with a running-time
+    profile name from ``tube.timetable.PROFILES`` it is in minutes.
+    """
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self._adjacency = {}
+        self.settled = 0
+
+    def adjacency(self, profile=None):
+        if profile not in self._adjacency:
+            weight = None
+            if profile is not None:
+                weight = np.asarray(self.snapshot.edge_running_time)[:, PROFILES[profile]]
+            self._adjacency[profile] = adjacency_lists(self.snapshot, weight)
+        return self._adjacency[profile]
+
+    def reachable(self, station, budget, profile=None):
+        """Return ``{station: cost}`` for every station within ``budget``, cheapest first."""
+        station_id = self.snapshot.station_id
+        if station not in station_id:
+            raise StationNotFound(f'{station} is not in the network')
+        dist, _ = shortest_path_tree(self.adjacency(profile), station_id[station], max_cost=budget)
+        self.settled = len(dist)
+        stations = self.snapshot.stations
+        return {stations[i]: cost for i, cost in sorted(dist.items(), key=lambda item: item[1])}
@@ -0,0 +1,231 @@
+"""Level-of-detail map labels.
+
+Drawing every station name and every segment's distance label as its own
+text artist costs more than the rest of the map together and piles the
+labels on top of each other. ``LabelLayer`` is one artist that lays its
+labels out for each view it is drawn in, so a pan or zoom with the
+toolbar shows the labels that suit the new view:
+
+* labels whose anchor is outside the view are culled through a bucket
+  grid over the OS X/OS Y positions (``locate.BucketGrid``);
+* the rest are placed in priority order at the first candidate spot
+  around their anchor that does not overlap a label already placed,
+  and dropped if there is none, so zooming in brings more of them back;
+* a group can ask for a label only once its segment is as long on screen
+  as the label is wide (the distance labels), and can cap how many of its
+  labels one view shows.
+
+Text sizes are estimated from the character count rather than measured,
+and only the labels on screen have Text artists, which are reused from
+layout to layout. The rendered labels are kept as a bitmap until the
+view changes, and a view seen only in the middle of a pan drag reuses
+the bitmap instead of getting a layout of its own.
+"""
+import math
+from collections import namedtuple
+
+import numpy as np
+from matplotlib.artist import Artist
+from matplotlib.backends.backend_agg import RendererAgg
+from matplotlib.text import Text
+from matplotlib.transforms import IdentityTransform
+
+from tube.locate import BucketGrid
+
+# Candidate spots around an anchor as (dx, dy, ha, va); offsets in font sizes.
+AROUND = [(0.3, -0.3, 'left', 'top'), (-0.3, -0.3, 'right', 'top'),
+          (0.3, 0.3, 'left', 'bottom'), (-0.3, 0.3, 'right', 'bottom')]
+CENTERED = [(0.0, 0.0, 'center', 'center')]
+
+# Rough glyph box in font sizes, for bold sans-serif.
+CHAR_WIDTH = 0.62
+LINE_HEIGHT = 1.25
+
+_SHIFT = {'left': 0.0, 'center': -0.5, 'right': -1.0, 'bottom': 0.0, 'top': -1.0}
+
+# The rendered labels of one view; ``origin`` is the data point at its lower left.
+_Bitmap = namedtuple('_Bitmap', 'key scale origin image placed')
+
+
+class LabelGroup:
+    """Labels sharing a style and placement rule.
+
+    ``priority`` orders the contest for space (highest first). ``extent``,
+    if given, is each label's segment as a (dx, dy) data vector; the label
+    is only shown while that segment is at least as long as the label on
+    screen. At most ``max_labels`` of the group are placed in one view,
+    the highest priority first. ``style`` goes to every Text (fontsize,
+    bbox, colour...).
+    """
+
+    def __init__(self, xy, texts, priority=None, anchors=CENTERED, extent=None, max_candidates=2000,
+                 max_labels=None, **style):
+        self.xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+        self.texts = list(texts)
+        self.priority = np.zeros(len(self.texts)) if priority is None else np.asarray(priority, dtype=float)
+        self.anchors = anchors
+        self.extent = None if extent is None else np.asarray(extent, dtype=float).reshape(-1, 2)
+        self.max_candidates = max_candidates
+        self.max_labels = max_labels
+        self.style = style
+        self.fontsize = style.get('fontsize', 10)
+        lines = [text.split('\n') for text in self.texts]
+        # Label width and height in font sizes.
+        self.size = np.array([(max(map(len, rows)) * CHAR_WIDTH, len(rows) * LINE_HEIGHT) for rows in lines],
+                             dtype=float).reshape(-1, 2)
+        self.grid = BucketGrid(self.xy)
+
+
+class _Occupancy:
+    # Placed boxes bucketed by screen cell, for overlap tests.
+    def __init__(self, cell=48.0):
+        self.cell = cell
+        self.buckets = {}
+
+    def _cells(self, box):
+        x0, y0, x1, y1 = (int(math.floor(v / self.cell)) for v in box)
+        return [(cx, cy) for cx in range(x0, x1 + 1) for cy in range(y0, y1 + 1)]
+
+    def free(self, box):
+        x0, y0, x1, y1 = box
+        for cell in self._cells(box):
+            for a0, b0, a1, b1 in self.buckets.get(cell, ()):
+                if x0 < a1 and a0 < x1 and y0 < b1 and b0 < y1:
+                    return False
+        return True
+
+    def add(self, box):
+        for cell in self._cells(box):
+            self.buckets.setdefault(cell, []).append(box)
+
+
+class LabelLayer(Artist):
+    """One artist drawing the placed labels of its groups, in group order.
+
+    Rasterizing the text is most of the cost, so on raster canvases the
+    labels of a view are rendered once into a bitmap that is reused for as
+    long as the view, the axes size and the dpi stay the same. While
+    ``dragging`` is set (a toolbar pan in progress) nothing is laid out: the
+    bitmap moves with the map when the scale is unchanged and is left out
+    when it is not, until the drag ends and the view is drawn again.
+    """
+
+    def __init__(self, groups, padding=1.0):
+        super().__init__()
+        self.groups = list(groups)
+        self.padding = padding
+        self.placed = 0
+        self.dragging = False
+        self._pools = [[] for _ in self.groups]
+        self._bitmap = None
+        self.set_zorder(2.5)
+
+    def layout(self, renderer):
+        """Place the labels for the current view; returns [(group, index, x, y, ha, va)] in pixels."""
+        ax = self.axes
+        view = ax.viewLim
+        frame = ax.bbox
+        to_pixels = ax.transData
+        points = renderer.points_to_pixels(1.0)
+        occupied = _Occupancy()
+        placements = []
+        for g, group in enumerate(self.groups):
+            candidates = np.array(group.grid.within(view.xmin, view.ymin, view.xmax, view.ymax), dtype=int)
+            if not len(candidates):
+                continue
+            em = group.fontsize * points
+            sizes = group.size[candidates] * em
+            if group.extent is not None:
+                origin = to_pixels.transform(group.xy[candidates])
+                tip = to_pixels.transform(group.xy[candidates] + group.extent[candidates])
+                keep = np.hypot(*(tip - origin).T) >= sizes[:, 0]
+                candidates, sizes = candidates[keep], sizes[keep]
+            order = np.lexsort((candidates, -group.priority[candidates]))[:group.max_candidates]
+            candidates, sizes = candidates[order], sizes[order]
+            anchors = to_pixels.transform(group.xy[candidates]).tolist()
+            pad = self.padding * points
+            placed = 0
+            for i, (x, y), (w, h) in zip(candidates.tolist(), anchors, sizes.tolist()):
+                if placed == group.max_labels:
+                    break
+                for dx, dy, ha, va in group.anchors:
+                    left = x + dx * em + _SHIFT[ha] * w
+                    bottom = y + dy * em + _SHIFT[va] * h
+                    box = (left - pad, bottom - pad, left + w + pad, bottom + h + pad)
+                    if (box[0] < frame.x0 or box[2] > frame.x1 or box[1] < frame.y0 or box[3] > frame.y1
+                            or not occupied.free(box)):
+                        continue
+                    occupied.add(box)
+                    placements.append((g, i, x + dx * em, y + dy * em, ha, va))
+                    placed += 1
+                    break
+        return placements
+
+    def _text(self, g, n):
+        pool = self._pools[g]
+        while len(pool) <= n:
+            text = Text(**self.groups[g].style)
+            text.set_figure(self.figure)
+            text.set_transform(IdentityTransform())
+            pool.append(text)
+        return pool[n]
+
+    def _texts(self, placements, dx=0.0, dy=0.0):
+        # Pooled Text artists for the placements, moved by (dx, dy) pixels.
+        used = [0] * len(self.groups)
+        texts = []
+        for g, i, x, y, ha, va in placements:
+            text = self._text(g, used[g])
+            used[g] += 1
+            text.set_text(self.groups[g].texts[i])
+            text.set_position((x + dx, y + dy))
+            text.set_horizontalalignment(ha)
+            text.set_verticalalignment(va)
+            texts.append(text)
+        return texts
+
+    def _scale(self, renderer):
+        # Data units per pixel (to 9 digits, as panning moves both limits by
+        # rounding error), the axes size in pixels and the dpi.
+        view, frame = self.axes.viewLim, self.axes.bbox
+        return (float(f'{view.width / frame.width:.9g}'), float(f'{view.height / frame.height:.9g}'),
+                frame.width, frame.height, renderer.dpi)
+
+    def _render(self, renderer, key, scale):
+        frame = self.axes.bbox
+        x0, y0 = math.floor(frame.x0), math.floor(frame.y0)
+        offscreen = RendererAgg(math.ceil(frame.x1) - x0, math.ceil(frame.y1) - y0, renderer.dpi)
+        texts = self._texts(self.layout(renderer), -x0, -y0)
+        for text in texts:
+            text.draw(offscreen)
+        origin = tuple(self.axes.transData.inverted().transform((x0, y0)))
+        # draw_image takes the bottom row first; the buffer starts at the top.
+        image = np.ascontiguousarray(np.asarray(offscreen.buffer_rgba())[::-1])
+        return _Bitmap(key, scale, origin, image, len(texts))
+
+    def draw(self, renderer):
+        if not self.get_visible() or self.axes.bbox.width < 1 or self.axes.bbox.height < 1:
+            return
+        if not hasattr(renderer, 'buffer_rgba'):
+            # Vector output (PDF, SVG) keeps the labels as text.
+            texts = self._texts(self.layout(renderer))
+            for text in texts:
+                text.draw(renderer)
+            self.placed = len(texts)
+            self.stale = False
+            return
+        scale = self._scale(renderer)
+        key = (self.axes.viewLim.bounds, scale)
+        bitmap = self._bitmap
+        if bitmap is None or not (bitmap.key == key or (self.dragging and bitmap.scale == scale)):
+            self.stale = False
+            if self.dragging:
+                return
+            bitmap = self._bitmap = self._render(renderer, key, scale)
+        x, y = self.axes.transData.transform(bitmap.origin)
+        gc = renderer.new_gc()
+        gc.set_clip_rectangle(self.axes.bbox)
+        renderer.draw_image(gc, round(x), round(y), bitmap.image)
+        gc.restore()
+        self.placed = bitmap.placed
+        self.stale = False
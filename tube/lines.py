@@ -0,0 +1,205 @@
+"""Line-expanded routing graph with interchange penalties.
+
+The station graph keeps one edge per station pair, so where two lines share
+a segment the later CSV row wins and changing lines is free. Here every
+(station, line) pair is its own node: ride edges join nodes on the same
+line and transfer edges join the nodes of one station. Transfer edges carry
+no weight in the cached arrays; the interchange cost is applied at query
+time, so one cached graph serves any penalty.
+"""
+import heapq
+import math
+import os
+from collections import namedtuple
+
+import numpy as np
+
+from tube.network import StationNotFound
+from tube.snapshot import atomic_write
+
+# Default cost of changing lines, in the units of the edge weight (km for
+# distance routing, minutes when routing on running times).
+DEFAULT_INTERCHANGE_COST = 0.5
+
+TRANSFER = -1
+
+# ``legs`` is a list of (line, stations) pairs; ``distance`` sums the ride
+# edges only, while ``cost`` also includes the interchange penalties.
+class LineRoute(namedtuple('LineRoute', ['stations', 'legs', 'changes', 'distance', 'cost'])):
+    __slots__ = ()
+
+    def reversed(self):
+        legs = [(line, leg[::-1]) for line, leg in reversed(self.legs)]
+        return self._replace(stations=self.stations[::-1], legs=legs)
+
+_ARRAYS = ['node_station', 'node_line', 'indptr', 'indices', 'adj_edge']
+_cache = {}
+
+
+def _cache_path(snapshot):
+    return os.path.join(snapshot.path, f'lines-{snapshot.source_hash[:12]}.npz')
+
+
+def build_line_graph(snapshot):
+    src = np.asarray(snapshot.edge_src)
+    dst = np.asarray(snapshot.edge_dst)
+    line = np.asarray(snapshot.edge_line).astype(np.int64)
+    n_lines = max(len(snapshot.lines), 1)
+
+    # One node per (station, line) pair that some CSV row touches.
+    keys = np.concatenate([src * n_lines + line, dst * n_lines + line])
+    node_keys, inverse = np.unique(keys, return_inverse=True)
+    tail_node, head_node = inverse[:len(src)], inverse[len(src):]
+    node_station = (node_keys // n_lines).astype(np.int32)
+    node_line = (node_keys % n_lines).astype(np.int16)
+
+    # Ride edges: one per undirected (station pair, line), last CSV row wins.
+    lo, hi = np.minimum(tail_node, head_node), np.maximum(tail_node, head_node)
+    pair = lo.astype(np.int64) * len(node_keys) + hi
+    _, last = np.unique(pair[::-1], return_index=True)
+    last = len(pair) - 1 - last
+    heads = [lo[last], hi[last]]
+    tails = [hi[last], lo[last]]
+    rows = [last, last]
+
+    # Transfer edges between every pair of lines serving the same station.
+    order = np.argsort(node_station, kind='stable')
+    starts = np.flatnonzero(np.r_[True, np.diff(node_station[order]) != 0])
+    for group in np.split(order, starts[1:]):
+        if len(group) > 1:
+            a, b = np.meshgrid(group, group, indexing='ij')
+            mask = a != b
+            heads.append(a[mask])
+            tails.append(b[mask])
+            rows.append(np.full(mask.sum(), TRANSFER))
+
+    heads = np.concatenate(heads)
+    tails = np.concatenate(tails)
+    rows = np.concatenate(rows)
+    order = np.lexsort((tails, heads))
+    indptr = np.zeros(len(node_keys) + 1, dtype=np.int32)
+    np.cumsum(np.bincount(heads, minlength=len(node_keys)), out=indptr[1:])
+    return {
+        'node_station': node_station,
+        'node_line': node_line,
+        'indptr': indptr,
+        'indices': tails[order].astype(np.int32),
+        'adj_edge': rows[order].astype(np.int32),
+    }
+
+
+def load_line_graph(snapshot):
+    """Return the cached LineGraph for this dataset, building it at most once."""
+    key = (snapshot.path, snapshot.source_hash)
+    if key in _cache:
+        return _cache[key]
+    path = _cache_path(snapshot)
+    if os.path.exists(path):
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in _ARRAYS}
+    else:
+        arrays = build_line_graph(snapshot)
+        atomic_write(path, lambda f: np.savez(f, **arrays))
+    _cache[key] = LineGraph(snapshot, arrays)
+    return _cache[key]
+
+
+class LineGraph:
+    def __init__(self, snapshot, arrays):
+        self.snapshot = snapshot
+        for name, array in arrays.items():
+            setattr(self, name, array)
+        indptr = self.indptr.tolist()
+        indices = self.indices.tolist()
+        adj_edge = self.adj_edge.tolist()
+        self.adjacency = [
+            [(indices[k], adj_edge[k]) for k in range(indptr[i], indptr[i + 1])]
+            for i in range(len(self.node_station))
+        ]
+        self._node_station = self.node_station.tolist()
+        self.station_nodes = {}
+        for node, station in enumerate(self._node_station):
+            self.station_nodes.setdefault(station, []).append(node)
+        self._distance = np.asarray(snapshot.edge_distance).tolist()
+        self.settled = 0
+
+    @property
+    def num_nodes(self):
+        return len(self.node_station)
+
+    def route(self, start_station, end_station, interchange_cost=DEFAULT_INTERCHANGE_COST, weight=None):
+        """Best route with its line legs, charging ``interchange_cost`` per change.
+
+        ``weight`` is an optional per-edge weight array (e.g. one running-time
+        profile); the default is the distance in km. Returns a ``LineRoute``
+        or ``None`` if the stations are not connected.
+        """
+        station_id = self.snapshot.station_id
+        for station in (start_station, end_station):
+            if station not in station_id:
+                raise StationNotFound(f'{station} is not in the network')
+        source, target = station_id[start_station], station_id[end_station]
+        edge_weight = self._distance if weight is None else np.asarray(weight).tolist()
+        node_station = self._node_station
+
+        # Start on any line at the origin without paying for a change.
+        dist = {}
+        pred = {}
+        heap = []
+        for node in self.station_nodes.get(source, []):
+            dist[node] = 0.0
+            pred[node] = -1
+            heap.append((0.0, node))
+        heapq.heapify(heap)
+        settled = set()
+        end = -1
+        while heap:
+            d, u = heapq.heappop(heap)
+            if u in settled:
+                continue
+            settled.add(u)
+            if node_station[u] == target:
+                end = u
+                break
+            for v, e in self.adjacency[u]:
+                nd = d + (interchange_cost if e == TRANSFER else edge_weight[e])
+                if nd < dist.get(v, math.inf):
+                    dist[v] = nd
+                    pred[v] = u
+                    heapq.heappush(heap, (nd, v))
+        self.settled = len(settled)
+        if end == -1:
+            return None
+
+        nodes = []
+        while end != -1:
+            nodes.append(end)
+            end = pred[end]
+        nodes.reverse()
+        return self._describe(nodes, dist[nodes[-1]], edge_weight)
+
+    def _describe(self, nodes, cost, edge_weight):
+        stations, lines = self.snapshot.stations, self.snapshot.lines
+        legs = []
+        distance = 0.0
+        for prev, node in zip([-1] + nodes[:-1], nodes):
+            station = stations[self.node_station[node]]
+            line = lines[self.node_line[node]]
+            if legs and legs[-1][0] == line:
+                legs[-1][1].append(station)
+                distance += self._ride_weight(prev, node, edge_weight)
+            else:
+                # The first node, or a transfer: the new leg starts at this station.
+                legs.append((line, [station]))
+        # With a zero interchange cost a search may hop lines without riding.
+        legs = [leg for leg in legs if len(leg[1]) > 1] or legs[:1]
+        route = [legs[0][1][0]]
+        for _, leg_stations in legs:
+            route.extend(leg_stations[1:])
+        return LineRoute(route, legs, len(legs) - 1, distance, cost)
+
+    def _ride_weight(self, u, v, edge_weight):
+        for w, e in self.adjacency[u]:
+            if w == v and e != TRANSFER:
+                return edge_weight[e]
+        return 0.0
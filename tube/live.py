@@ -0,0 +1,293 @@
+"""Live closures and delays on the in-memory network.
+
+``LiveNetwork`` wraps a snapshot with mutable adjacency lists. Segments and
+stations can be closed and reopened and segment weights changed without
+touching distance.csv; each change rewrites only the adjacency lists of the
+two stations involved (and the networkx graph, if one is attached).
+
+Shortest-path trees held by ``ShortestPathTrees`` (including the rows of an
+all-pairs table) are repaired in place: a tree is only touched if the
+changed segment is one of its tree edges (weight went up) or now offers a
+shorter path (weight went down), and then only the affected part of the
+tree is searched again. Structures that cannot be repaired this way, such
+as a contraction hierarchy or a RouteCache, should be rebuilt or
+re-bound against ``dataset_key`` after a change.
+"""
+import heapq
+import math
+
+import numpy as np
+
+from tube.network import StationNotFound
+from tube.search import bidirectional_dijkstra
+
+
+class LiveNetwork:
+    def __init__(self, snapshot, graph=None):
+        self.snapshot = snapshot
+        self.graph = graph
+        self.version = 0
+        self.closed_segments = set()
+        self.closed_stations = set()
+        self.weight_overrides = {}
+        self.listeners = []
+
+        # Base weight and CSV row per undirected station pair, from the snapshot CSR.
+        distance = np.asarray(snapshot.edge_distance)
+        indptr, indices, adj_edge = snapshot.indptr.tolist(), snapshot.indices.tolist(), snapshot.adj_edge.tolist()
+        self.base = {}
+        for u in range(snapshot.num_stations):
+            for k in range(indptr[u], indptr[u + 1]):
+                self.base[(u, indices[k])] = (float(distance[adj_edge[k]]), adj_edge[k])
+        self.adjacency = [[] for _ in range(snapshot.num_stations)]
+        for (u, v), (w, _) in self.base.items():
+            self.adjacency[u].append((v, w))
+
+    @property
+    def dataset_key(self):
+        # Changes with every update, so caches bound to it drop stale routes.
+        return f'{self.snapshot.source_hash}:{self.version}'
+
+    def attach_cache(self, cache):
+        """Re-bind ``cache`` (an LRUCache) to ``dataset_key`` after every change."""
+        self.listeners.append(_CacheBinding(self, cache))
+        cache.bind(self.dataset_key)
+
+    def _id(self, station):
+        try:
+            return self.snapshot.station_id[station]
+        except KeyError:
+            raise StationNotFound(f'{station} is not in the network') from None
+
+    def _pair(self, a, b):
+        u, v = self._id(a), self._id(b)
+        if (u, v) not in self.base:
+            raise KeyError(f'{a} and {b} are not adjacent')
+        return u, v
+
+    def weight(self, u, v):
+        """Current weight of segment u-v, or None while it is closed."""
+        key = (min(u, v), max(u, v))
+        if key in self.closed_segments or u in self.closed_stations or v in self.closed_stations:
+            return None
+        if key in self.weight_overrides:
+            return self.weight_overrides[key]
+        return self.base[(u, v)][0]
+
+    def _apply(self, pairs, change):
+        old = {pair: self.weight(*pair) for pair in pairs}
+        change()
+        self.version += 1
+        for u, v in pairs:
+            new = self.weight(u, v)
+            if new == old[(u, v)]:
+                continue
+            self._rewrite(u, v, new)
+            for listener in self.listeners:
+                listener.segment_changed(u, v, old[(u, v)], new)
+
+    def _rewrite(self, u, v, new):
+        for a, b in ((u, v), (v, u)):
+            edges = [(x, w) for x, w in self.adjacency[a] if x != b]
+            if new is not None:
+                edges.append((b, new))
+            self.adjacency[a] = edges
+        if self.graph is not None:
+            stations = self.snapshot.stations
+            if new is None:
+                if self.graph.has_edge(stations[u], stations[v]):
+                    self.graph.remove_edge(stations[u], stations[v])
+            else:
+                line = self.snapshot.lines[self.snapshot.edge_line[self.base[(u, v)][1]]]
+                self.graph.add_edge(stations[u], stations[v], weight=new, line=line)
+
+    def close_segment(self, a, b):
+        u, v = self._pair(a, b)
+        self._apply([(u, v)], lambda: self.closed_segments.add((min(u, v), max(u, v))))
+
+    def reopen_segment(self, a, b):
+        u, v = self._pair(a, b)
+        self._apply([(u, v)], lambda: self.closed_segments.discard((min(u, v), max(u, v))))
+
+    def set_weight(self, a, b, weight):
+        """Temporarily replace the weight of segment a-b (same units as the base weight)."""
+        u, v = self._pair(a, b)
+        self._apply([(u, v)], lambda: self.weight_overrides.__setitem__((min(u, v), max(u, v)), float(weight)))
+
+    def add_delay(self, a, b, extra):
+        u, v = self._pair(a, b)
+        current = self.weight_overrides.get((min(u, v), max(u, v)), self.base[(u, v)][0])
+        self.set_weight(a, b, current + extra)
+
+    def clear_weight(self, a, b):
+        u, v = self._pair(a, b)
+        self._apply([(u, v)], lambda: self.weight_overrides.pop((min(u, v), max(u, v)), None))
+
+    def _station_pairs(self, u):
+        return [(u, v) for (a, v) in self.base if a == u]
+
+    def close_station(self, station):
+        u = self._id(station)
+        self._apply(self._station_pairs(u), lambda: self.closed_stations.add(u))
+
+    def reopen_station(self, station):
+        u = self._id(station)
+        self._apply(self._station_pairs(u), lambda: self.closed_stations.discard(u))
+
+    def route(self, start_station, end_station):
+        source, target = self._id(start_station), self._id(end_station)
+        if source in self.closed_stations or target in self.closed_stations:
+            return None, float('inf')
+        path, distance, _ = bidirectional_dijkstra(self.adjacency, source, target)
+        if path is None:
+            return None, float('inf')
+        return [self.snapshot.stations[i] for i in path], distance
+
+
+class _CacheBinding:
+    def __init__(self, live, cache):
+        self.live = live
+        self.cache = cache
+
+    def segment_changed(self, u, v, old, new):
+        self.cache.bind(self.live.dataset_key)
+
+
+def _tree(adjacency, source, n):
+    dist = np.full(n, np.inf)
+    pred = np.full(n, -1, dtype=np.int32)
+    dist[source] = 0.0
+    pred[source] = source
+    heap = [(0.0, source)]
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        for v, w in adjacency[u]:
+            nd = d + w
+            if nd < dist[v]:
+                dist[v] = nd
+                pred[v] = u
+                heapq.heappush(heap, (nd, v))
+    return dist, pred
+
+
+def _subtree(pred, root):
+    members = np.zeros(len(pred), dtype=bool)
+    members[root] = True
+    frontier = np.array([root])
+    while frontier.size:
+        children = np.flatnonzero(np.isin(pred, frontier) & ~members)
+        members[children] = True
+        frontier = children
+    return members
+
+
+def repair_increase(adjacency, dist, pred, u, v):
+    """Repair one tree after segment u-v got longer or closed. Returns True if it changed."""
+    if pred[v] == u and v != pred[v]:
+        child = v
+    elif pred[u] == v and u != pred[u]:
+        child = u
+    else:
+        return False   # Not a tree edge: every shortest path in this tree still holds.
+    reattach(adjacency, dist, pred, _subtree(pred, child))
+    return True
+
+
+def reattach(adjacency, dist, pred, members):
+    """Re-search the tree nodes in the boolean mask ``members`` after they were cut off."""
+    dist[members] = np.inf
+    pred[members] = -1
+    # Reattach the cut-off subtree from the best neighbour outside it.
+    heap = []
+    for x in np.flatnonzero(members).tolist():
+        for y, w in adjacency[x]:
+            if not members[y] and dist[y] + w < dist[x]:
+                dist[x] = dist[y] + w
+                pred[x] = y
+        if dist[x] < np.inf:
+            heap.append((dist[x], x))
+    heapq.heapify(heap)
+    while heap:
+        d, x = heapq.heappop(heap)
+        if d > dist[x]:
+            continue
+        for y, w in adjacency[x]:
+            if members[y] and d + w < dist[y]:
+                dist[y] = d + w
+                pred[y] = x
+                heapq.heappush(heap, (dist[y], y))
+
+
+def repair_decrease(adjacency, dist, pred, u, v, weight):
+    """Repair one tree after segment u-v got shorter or reopened. Returns True if it changed."""
+    heap = []
+    for a, b in ((u, v), (v, u)):
+        if dist[a] + weight < dist[b]:
+            dist[b] = dist[a] + weight
+            pred[b] = a
+            heap.append((dist[b], b))
+    if not heap:
+        return False
+    heapq.heapify(heap)
+    while heap:
+        d, x = heapq.heappop(heap)
+        if d > dist[x]:
+            continue
+        for y, w in adjacency[x]:
+            if d + w < dist[y]:
+                dist[y] = d + w
+                pred[y] = x
+                heapq.heappush(heap, (dist[y], y))
+    return True
+
+
+class ShortestPathTrees:
+    """Single-source shortest-path trees kept in step with a LiveNetwork.
+
+    Trees are computed on first use per source, or taken from an all-pairs
+    table with ``load_table``. ``repaired`` counts tree repairs, so callers
+    can see how many trees an update actually touched.
+    """
+
+    def __init__(self, live):
+        self.live = live
+        self.trees = {}
+        self.repaired = 0
+        live.listeners.append(self)
+
+    def load_table(self, dist, pred):
+        # Table rows are trees: pred[i, j] is j's predecessor from source i.
+        for i in range(len(dist)):
+            self.trees[i] = (np.array(dist[i]), np.array(pred[i]))
+
+    def as_table(self):
+        """Stack the trees of every source back into ``(dist, pred)`` for TableEngine."""
+        rows = [self.tree(i) for i in range(self.live.snapshot.num_stations)]
+        return np.stack([d for d, _ in rows]), np.stack([p for _, p in rows])
+
+    def tree(self, source):
+        if source not in self.trees:
+            self.trees[source] = _tree(self.live.adjacency, source, self.live.snapshot.num_stations)
+        return self.trees[source]
+
+    def segment_changed(self, u, v, old, new):
+        adjacency = self.live.adjacency
+        for dist, pred in self.trees.values():
+            if new is None or (old is not None and new > old):
+                changed = repair_increase(adjacency, dist, pred, u, v)
+            else:
+                changed = repair_decrease(adjacency, dist, pred, u, v, new)
+            self.repaired += changed
+
+    def route(self, start_station, end_station):
+        source, target = self.live._id(start_station), self.live._id(end_station)
+        dist, pred = self.tree(source)
+        if not math.isfinite(dist[target]):
+            return None, float('inf')
+        path = [target]
+        while path[-1] != source:
+            path.append(int(pred[path[-1]]))
+        path.reverse()
+        return [self.live.snapshot.stations[i] for i in path], float(dist[target])
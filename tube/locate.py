@@ -0,0 +1,195 @@
+"""Find stations from coordinates or postcodes instead of exact names.
+
+``StationLocator`` keeps a uniform grid over the stations' OS X/OS Y
+positions (and a second one over latitude/longitude projected to metres),
+so a nearest-station lookup only scans the few cells around the query
+point. Postcodes are indexed three ways: whole, by outward code (the
+district, 'NW1') and by area letters ('NW'). An unknown full postcode
+falls back to its district and then its area, never to a longer
+district that happens to share its characters ('E1 6XX' is not E16).
+
+A point is snapped to its k nearest stations and routed from all of them
+at once by a multi-source search, each start costed by the straight-line
+walk to it.
+"""
+import csv
+import math
+
+import numpy as np
+
+from tube.network import StationNotFound
+from tube.search import adjacency_lists, multi_source_dijkstra
+
+EARTH_RADIUS = 6371000.0
+
+
+def split_postcode(postcode):
+    """``(outward, inward)`` codes of a postcode; ``inward`` is '' for an outward code alone.
+
+    Without a space the last three characters are the inward code, if at
+    least two are left for the outward code ('NW15LJ' is 'NW1', '5LJ').
+    """
+    parts = postcode.upper().split()
+    if len(parts) > 1:
+        return parts[0], ''.join(parts[1:])
+    code = parts[0] if parts else ''
+    if len(code) >= 5:
+        return code[:-3], code[-3:]
+    return code, ''
+
+
+def postcode_area(outward):
+    """The letters an outward code starts with: 'SW' for 'SW19'."""
+    return outward[:len(outward) - len(outward.lstrip('ABCDEFGHIJKLMNOPQRSTUVWXYZ'))]
+
+
+class BucketGrid:
+    """Uniform bucket grid of 2-D points for k-nearest and box queries."""
+
+    def __init__(self, xy, cell=None):
+        self.xy = np.asarray(xy, dtype=float)
+        self.origin = self.xy.min(axis=0) if len(self.xy) else np.zeros(2)
+        if cell is None:
+            # About two points per cell on average over the bounding box.
+            extent = np.ptp(self.xy, axis=0) if len(self.xy) else np.ones(2)
+            cell = max(1.0, math.sqrt(max(extent[0] * extent[1], 1.0) * 2 / max(len(self.xy), 1)))
+        self.cell = cell
+        cells = np.floor((self.xy - self.origin) / cell).astype(int)
+        self.shape = cells.max(axis=0) + 1 if len(cells) else np.ones(2, dtype=int)
+        self.buckets = {}
+        for i, (cx, cy) in enumerate(cells.tolist()):
+            self.buckets.setdefault((cx, cy), []).append(i)
+        self.xs = self.xy[:, 0].tolist()
+        self.ys = self.xy[:, 1].tolist()
+
+    def nearest(self, x, y, k=1):
+        """The ``k`` nearest points as ``[(index, distance)]``, closest first."""
+        k = min(k, len(self.xs))
+        if not k:
+            return []
+        cx = int(math.floor((x - self.origin[0]) / self.cell))
+        cy = int(math.floor((y - self.origin[1]) / self.cell))
+        nx, ny = int(self.shape[0]), int(self.shape[1])
+        # Scan square rings of cells outwards, starting at the first ring that
+        # touches the grid. Anything in ring r + 1 is at least r cells away.
+        first = max(0, -cx, -cy, cx - nx + 1, cy - ny + 1)
+        last = max(cx, cy, nx - 1 - cx, ny - 1 - cy)
+        found = []
+        for r in range(first, last + 1):
+            found.extend((math.hypot(self.xs[i] - x, self.ys[i] - y), i) for i in self._ring(cx, cy, r))
+            if len(found) >= k:
+                found.sort()
+                if found[k - 1][0] <= r * self.cell:
+                    break
+        found.sort()
+        return [(i, d) for d, i in found[:k]]
+
+    def within(self, xmin, ymin, xmax, ymax):
+        """Indices of the points inside the box, in no particular order."""
+        x0 = max(0, int(math.floor((xmin - self.origin[0]) / self.cell)))
+        y0 = max(0, int(math.floor((ymin - self.origin[1]) / self.cell)))
+        x1 = min(int(self.shape[0]) - 1, int(math.floor((xmax - self.origin[0]) / self.cell)))
+        y1 = min(int(self.shape[1]) - 1, int(math.floor((ymax - self.origin[1]) / self.cell)))
+        if x1 - x0 + 1 > 0 and y1 - y0 + 1 > 0 and (x1 - x0 + 1) * (y1 - y0 + 1) >= len(self.buckets):
+            # The box covers most of the grid; walking the buckets is cheaper.
+            cells = ((cx, cy) for cx, cy in self.buckets if x0 <= cx <= x1 and y0 <= cy <= y1)
+        else:
+            cells = ((cx, cy) for cx in range(x0, x1 + 1) for cy in range(y0, y1 + 1))
+        xs, ys = self.xs, self.ys
+        return [i for cell in cells for i in self.buckets.get(cell, ())
+                if xmin <= xs[i] <= xmax and ymin <= ys[i] <= ymax]
+
+    def _ring(self, cx, cy, r):
+        if r == 0:
+            yield from self.buckets.get((cx, cy), ())
+            return
+        for dx in range(-r, r + 1):
+            for dy in (-r, r):
+                yield from self.buckets.get((cx + dx, cy + dy), ())
+        for dy in range(-r + 1, r):
+            for dx in (-r, r):
+                yield from self.buckets.get((cx + dx, cy + dy), ())
+
+
+class StationLocator:
+    """Nearest-station and postcode lookups for the stations of a snapshot."""
+
+    def __init__(self, snapshot, coordinates_file='stations.csv', cell=None):
+        self.snapshot = snapshot
+        self.grid = BucketGrid(np.column_stack([snapshot.os_x, snapshot.os_y]), cell)
+
+        latlon = {}
+        # Station ids by full postcode, by outward code and by area.
+        self.postcodes, self.districts, self.areas = {}, {}, {}
+        with open(coordinates_file, newline='') as f:
+            for row in csv.DictReader(f):
+                i = snapshot.station_id.get(row['Station'])
+                if i is None:
+                    continue
+                latlon[i] = (float(row['Latitude']), float(row['Longitude']))
+                if row['Postcode'].strip():
+                    outward, inward = split_postcode(row['Postcode'])
+                    self.postcodes.setdefault(outward + inward, []).append(i)
+                    self.districts.setdefault(outward, []).append(i)
+                    self.areas.setdefault(postcode_area(outward), []).append(i)
+
+        # Latitude/longitude projected to metres around the network's mean latitude.
+        self.latlon_ids = sorted(latlon)
+        lat = np.radians([latlon[i][0] for i in self.latlon_ids])
+        lon = np.radians([latlon[i][1] for i in self.latlon_ids])
+        self.lat0 = float(lat.mean()) if len(lat) else 0.0
+        self.latlon_grid = BucketGrid(np.column_stack(self._project(lat, lon)), cell)
+        self.adjacency = None
+
+    def _project(self, lat, lon):
+        return lon * math.cos(self.lat0) * EARTH_RADIUS, lat * EARTH_RADIUS
+
+    def nearest(self, x, y, k=1):
+        """The ``k`` stations nearest OS grid point (x, y) as ``[(station, metres)]``."""
+        stations = self.snapshot.stations
+        return [(stations[i], d) for i, d in self.grid.nearest(x, y, k)]
+
+    def nearest_latlon(self, latitude, longitude, k=1):
+        x, y = self._project(math.radians(latitude), math.radians(longitude))
+        stations = self.snapshot.stations
+        return [(stations[self.latlon_ids[i]], d) for i, d in self.latlon_grid.nearest(x, y, k)]
+
+    def _postcode_ids(self, postcode):
+        outward, inward = split_postcode(postcode)
+        if not outward:
+            return []
+        return (inward and self.postcodes.get(outward + inward) or self.districts.get(outward)
+                or self.areas.get(postcode_area(outward)) or [])
+
+    def by_postcode(self, postcode):
+        """Stations at ``postcode``, or failing that in its district, or failing that in its area."""
+        stations = self.snapshot.stations
+        return [stations[i] for i in self._postcode_ids(postcode)]
+
+    def postcode_point(self, postcode):
+        """OS grid point of ``postcode``: the centroid of the stations ``by_postcode`` finds, or None."""
+        ids = self._postcode_ids(postcode)
+        if not ids:
+            return None
+        return float(np.mean(self.snapshot.os_x[ids])), float(np.mean(self.snapshot.os_y[ids]))
+
+    def route_from(self, starts, end_station, walk_factor=1.0):
+        """Best route from any of ``starts`` (``[(station, metres)]``) to ``end_station``.
+
+        Each start is costed by its straight-line distance in km times
+        ``walk_factor``. Returns ``(best_route, track_distance, access_distance)``.
+        """
+        station_id = self.snapshot.station_id
+        if end_station not in station_id:
+            raise StationNotFound(f'{end_station} is not in the network')
+        if self.adjacency is None:
+            self.adjacency = adjacency_lists(self.snapshot)
+        access = {}
+        for station, metres in starts:
+            cost = metres / 1000.0 * walk_factor
+            access[station_id[station]] = min(cost, access.get(station_id[station], math.inf))
+        path, total, _ = multi_source_dijkstra(self.adjacency, access, station_id[end_station])
+        if path is None:
+            return None, float('inf'), float('inf')
+        stations = self.snapshot.stations
+        return [stations[i] for i in path], total - access[path[0]], access[path[0]]
@@ -0,0 +1,131 @@
+"""Phase timers, counters and one-shot profiling.
+
+Instrumentation is off unless ``METRICS.enable()`` is called. While it is
+off, ``timer`` hands back one shared no-op context manager and ``count``
+and ``observe`` return after a single flag check, so instrumented code
+pays next to nothing.
+
+Timers and observations are kept as count/sum/max summaries, counters as
+running totals. ``as_dict`` gives them as JSON-ready data and
+``to_prometheus`` in the Prometheus text exposition format.
+"""
+import contextlib
+import cProfile
+import json
+import threading
+import time
+
+_NULL = contextlib.nullcontext()
+
+
+class _Timer:
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics._add(self.metrics.timers, self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+    def __init__(self):
+        self.enabled = False
+        self.timers = {}
+        self.observations = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def reset(self):
+        with self._lock:
+            self.timers.clear()
+            self.observations.clear()
+            self.counters.clear()
+
+    def timer(self, name):
+        """Context manager timing one run of phase ``name``."""
+        if not self.enabled:
+            return _NULL
+        return _Timer(self, name)
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name, value):
+        """Record one value of a per-query quantity, e.g. nodes settled."""
+        if not self.enabled:
+            return
+        self._add(self.observations, name, value)
+
+    def _add(self, table, name, value):
+        with self._lock:
+            summary = table.get(name)
+            if summary is None:
+                table[name] = {'count': 1, 'sum': value, 'max': value}
+            else:
+                summary['count'] += 1
+                summary['sum'] += value
+                summary['max'] = max(summary['max'], value)
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'timers': {name: dict(summary) for name, summary in self.timers.items()},
+                'observations': {name: dict(summary) for name, summary in self.observations.items()},
+                'counters': dict(self.counters),
+            }
+
+    def to_json(self):
+        return json.dumps(self.as_dict(), indent=1, sort_keys=True)
+
+    def to_prometheus(self, prefix='tube'):
+        data = self.as_dict()
+        lines = []
+        if data['timers']:
+            lines += [f'# HELP {prefix}_phase_seconds Time spent per phase.',
+                      f'# TYPE {prefix}_phase_seconds summary']
+            for name, summary in sorted(data['timers'].items()):
+                lines.append(f'{prefix}_phase_seconds_sum{{phase="{name}"}} {summary["sum"]:.9g}')
+                lines.append(f'{prefix}_phase_seconds_count{{phase="{name}"}} {summary["count"]}')
+        for name, summary in sorted(data['observations'].items()):
+            lines += [f'# TYPE {prefix}_{name} summary',
+                      f'{prefix}_{name}_sum {summary["sum"]:.9g}',
+                      f'{prefix}_{name}_count {summary["count"]}']
+        for name, value in sorted(data['counters'].items()):
+            lines += [f'# TYPE {prefix}_{name}_total counter', f'{prefix}_{name}_total {value}']
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, path, fmt='json'):
+        text = self.to_prometheus() if fmt == 'prometheus' else self.to_json()
+        with open(path, 'w') as f:
+            f.write(text)
+
+
+@contextlib.contextmanager
+def profile(path):
+    """Run the block under cProfile and write the stats to ``path`` (no-op if None)."""
+    if path is None:
+        yield None
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+
+
+METRICS = Metrics()
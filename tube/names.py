@@ -0,0 +1,138 @@
+"""Normalized station and line names.
+
+distance.csv and stations.csv do not always spell a station the same way
+('ELEPHANT & CASTLE' / 'ELEPHANT AND CASTLE', 'BROMLEY BY BOW' /
+'BROMLEY-BY-BOW', 'EUSTON (CITY)' / 'EUSTON'), and line names carry
+trailing spaces ('Bakerloo '). ``normalize`` folds case, whitespace,
+punctuation, '&' and common abbreviations into one key so such names
+compare equal. ``NameIndex`` maps keys back to the canonical names and
+answers type-ahead prefix queries from a trie built once.
+"""
+import re
+
+from tube.network import StationNotFound
+
+ABBREVIATIONS = {
+    '&': 'and',
+    'street': 'st',
+    'saint': 'st',
+    'road': 'rd',
+    'square': 'sq',
+    'lane': 'ln',
+    'park': 'pk',
+    'junction': 'jct',
+    'terminal': 'term',
+    'terminals': 'term',
+    'one': '1',
+    'two': '2',
+    'three': '3',
+    'four': '4',
+    'five': '5',
+}
+
+# Normalized alias -> normalized canonical key, for names no folding rule links.
+ALIASES = {
+    'heathrow 123': 'heathrow term 1 2 3',
+    'h and c': 'hammersmith and city',
+}
+
+_QUALIFIER = re.compile(r'\s*\([^)]*\)')
+
+
+def _words(name):
+    text = name.casefold().replace('&', ' & ').replace("'", '').replace('.', ' ')
+    return re.findall(r'[\w&]+', text)
+
+
+def normalize(name):
+    """Folded lookup key, e.g. "King's Cross St. Pancras " -> 'kings cross st pancras'."""
+    key = ' '.join(ABBREVIATIONS.get(word, word) for word in _words(name))
+    return ALIASES.get(key, key)
+
+
+def base_key(name):
+    """``normalize`` without a bracketed qualifier: 'EUSTON (CITY)' -> 'euston'."""
+    return normalize(_QUALIFIER.sub('', name))
+
+
+def match_names(names, known):
+    """Map each of ``names`` that is not in ``known`` to the known name it means.
+
+    A name matches on its normalized key first, then on its key without a
+    bracketed branch qualifier. Names whose key fits several known names
+    (e.g. 'HAMMERSMITH') are left out rather than guessed.
+    """
+    known = list(known)
+    by_key, by_base = {}, {}
+    for name in known:
+        by_key.setdefault(normalize(name), set()).add(name)
+        by_base.setdefault(base_key(name), set()).add(name)
+    known = set(known)
+    matches = {}
+    for name in names:
+        if name in known:
+            continue
+        candidates = by_key.get(normalize(name)) or by_base.get(base_key(name)) or ()
+        if len(candidates) == 1:
+            matches[name] = next(iter(candidates))
+    return matches
+
+
+class NameIndex:
+    """Normalized lookups and prefix completion over a list of names.
+
+    ``complete`` matches the start of any word, so 'cross' finds
+    "KING'S CROSS ST. PANCRAS" as well as 'CROSSHARBOUR'.
+    """
+
+    def __init__(self, names):
+        self.names = sorted(names)
+        self._names = set(self.names)
+        self.by_key = {}
+        for name in self.names:
+            self.by_key.setdefault(normalize(name), name)
+            self.by_key.setdefault(base_key(name), name)
+        # Each trie node stores the names completing it, so a keystroke is
+        # one walk down len(prefix) nodes. Names go in alphabetically, which
+        # keeps every node's list sorted and lets _insert skip repeats.
+        self.trie = {'': []}
+        # Both the abbreviated and the spelled-out words are indexed, so a
+        # half-typed 'stre' still finds the streets.
+        for name in self.names:
+            for words in (normalize(name).split(), _words(name)):
+                for i in range(len(words)):
+                    self._insert(' '.join(words[i:]), name)
+
+    def _insert(self, key, name):
+        node = self.trie
+        for char in key:
+            node = node.setdefault(char, {'': []})
+            if not node[''] or node[''][-1] != name:
+                node[''].append(name)
+
+    def resolve(self, text):
+        """The canonical name for ``text``; raises StationNotFound if there is none."""
+        if text in self._names:
+            return text
+        name = self.by_key.get(normalize(text)) or self.by_key.get(base_key(text))
+        if name is None:
+            raise StationNotFound(f'{text} is not in the network')
+        return name
+
+    def complete(self, prefix, limit=None):
+        """Names with a word starting with ``prefix``, in alphabetical order."""
+        keys = {normalize(prefix), ' '.join(_words(prefix))}
+        if not all(keys):
+            return self.names[:limit]
+        if prefix[-1:].isspace():
+            keys = {key + ' ' for key in keys}
+        found = set()
+        for key in keys:
+            node = self.trie
+            for char in key:
+                node = node.get(char)
+                if node is None:
+                    break
+            else:
+                found.update(node[''])
+        return sorted(found)[:limit]
@@ -0,0 +1,122 @@
+"""Loading, graph building, statistics and routing for the tube network.
+
+Importing this module has no side effects and pulls in no heavy
+dependencies; pandas and networkx are imported by the functions that
+need them.
+"""
+import re
+
+from tube.metrics import METRICS
+
+ALL_ZONES = 'all'
+
+
+class StationNotFound(KeyError):
+    """A station name that is not in the loaded network."""
+
+
+def load_data(file_path):
+    import pandas as pd
+
+    with METRICS.timer('load_data'):
+        data = pd.read_csv(file_path, encoding='latin1')
+    return data
+
+
+def parse_zones(value):
+    """The zones a stations.csv Zone value covers, e.g. '2,3' or '1/2'."""
+    return tuple(zone.strip() for zone in re.split(r'[,/]', str(value)) if zone.strip())
+
+
+def zone_filter(zone):
+    # None or 'all' selects the whole network; otherwise a zone label, a
+    # '1,2' style list or an iterable of labels.
+    if zone is None or zone == ALL_ZONES:
+        return None
+    if isinstance(zone, str):
+        return set(parse_zones(zone))
+    return {str(z) for z in zone}
+
+
+def zone_sort_key(zone):
+    return (not zone.isdigit(), int(zone) if zone.isdigit() else 0, zone)
+
+
+def _select_zones(coordinates_data, zone):
+    wanted = zone_filter(zone)
+    if wanted is None:
+        return coordinates_data
+    # Boundary stations belong to every zone they list.
+    zones = coordinates_data['Zone'].astype(str).str.split(r'[,/]', regex=True).explode().str.strip()
+    return coordinates_data[zones.isin(wanted).groupby(level=0).any()]
+
+
+def load_coordinates(coordinates_file, zone='1', columns=('OS X', 'OS Y')):
+    import pandas as pd
+
+    with METRICS.timer('load_coordinates'):
+        coordinates_data = pd.read_csv(coordinates_file, usecols=['Station', 'Zone', *columns])
+        coordinates_data = _select_zones(coordinates_data, zone)
+        x, y = columns
+        return dict(zip(coordinates_data['Station'], zip(coordinates_data[x], coordinates_data[y])))
+
+
+def load_station_zones(coordinates_file, zone=None):
+    import pandas as pd
+
+    coordinates_data = _select_zones(pd.read_csv(coordinates_file, usecols=['Station', 'Zone']), zone)
+    return {station: parse_zones(value) for station, value in zip(coordinates_data['Station'], coordinates_data['Zone'])}
+
+
+def filter_edges(df, station_coordinates):
+    # Keep the rows whose stations both have coordinates, keeping the CSV index
+    keep = df['Station from (A)'].isin(station_coordinates) & df['Station to (B)'].isin(station_coordinates)
+    return df[keep]
+
+
+def build_graph(df, graph=None):
+    import networkx as nx
+
+    g = nx.Graph() if graph is None else graph
+    with METRICS.timer('build_graph'):
+        g.add_edges_from(
+            (a, b, {'weight': w, 'line': line})
+            for a, b, w, line in zip(df['Station from (A)'], df['Station to (B)'], df['Distance (Kms)'], df['Line'])
+        )
+    return g
+
+
+def get_node_positions(G, station_coordinates):
+    default_position = (0, 0)
+    pos = {node: station_coordinates.get(node, default_position) for node in G.nodes()}
+    return pos
+
+
+def calculate_statistics(df):
+    total_length = df['Distance (Kms)'].sum()
+    average_distance = df['Distance (Kms)'].mean()
+    std_distance = df['Distance (Kms)'].std()
+    print(f"Total Length: {total_length:.2f} Kms")
+    print(f"Average Distance: {average_distance:.2f} Kms")
+    print(f"Standard Deviation: {std_distance:.2f} Kms")
+    return total_length, average_distance, std_distance
+
+
+def find_best_route(G, start_station, end_station, engine=None):
+    METRICS.count('route_queries')
+    if engine is not None:
+        with METRICS.timer('route'):
+            result = engine.route(start_station, end_station)
+        if METRICS.enabled and getattr(engine, 'settled', None) is not None:
+            METRICS.observe('nodes_settled', engine.settled)
+        return result
+    import networkx as nx
+
+    try:
+        # One traversal gives both the distance and the path
+        with METRICS.timer('route'):
+            best_distance, best_route = nx.single_source_dijkstra(G, start_station, end_station, weight='weight')
+    except nx.NetworkXNoPath:
+        best_route = None
+        best_distance = float('inf')
+    return best_route, best_distance
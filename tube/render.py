@@ -0,0 +1,312 @@
+"""Layered tube map renderer.
+
+The static network (edges, stations, labels, legend and statistics) is
+built once from batched artists: a single ``LineCollection`` for every
+line segment and a single scatter for every station, with per-node colours
+worked out up front. Station names and segment distances are one
+``labels.LabelLayer``, laid out for each new view and kept as a bitmap
+until the view changes; a toolbar pan moves that bitmap along and lays
+the labels out once, when the button is released. Each route query only
+replaces the overlay: the gold best route and any alternatives in
+secondary colours. On canvases that support blitting the rendered base
+layer is kept as a bitmap and the overlay is blitted on top of it, so
+the network is not redrawn.
+"""
+import io
+
+import matplotlib.patches as mpatches
+import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.collections import LineCollection
+from matplotlib.lines import Line2D
+
+from tube.labels import AROUND, LabelGroup, LabelLayer
+from tube.metrics import METRICS
+from tube.names import normalize
+
+COLORS = {
+    'Bakerloo ': 'brown',
+    'Central ': 'red',
+    'Circle ': 'yellow',
+    'District': 'green',
+    'Jubilee ': 'grey',
+    'Metropolitan': 'purple',
+    'Northern ': 'black',
+    'Piccadilly ': 'blue',
+    'Victoria': 'lightblue',
+    'H & C': 'pink',
+    'Waterloo & City': 'lightgreen',
+    'DLR': 'orange',
+}
+
+# COLORS keyed by normalized line name, so 'Bakerloo' and 'Bakerloo ' agree.
+_LINE_COLORS = {normalize(line): color for line, color in COLORS.items()}
+
+ROUTE_COLOR = 'gold'
+ALTERNATIVE_COLORS = ['darkorange', 'magenta', 'cyan', 'limegreen']
+
+
+def line_color(line, default='black'):
+    return _LINE_COLORS.get(normalize(line), default)
+
+
+def _time_rendering(artists, phase):
+    # Wrap each artist's draw so the time spent rendering it is charged to
+    # phase; only done while metrics are on, so a normal draw is untouched.
+    for artist in artists:
+        draw = artist.draw
+
+        def timed(renderer, *args, _draw=draw, **kwargs):
+            with METRICS.timer(phase):
+                return _draw(renderer, *args, **kwargs)
+
+        artist.draw = timed
+
+
+def offset_position(pos, index, total, max_offset=0.0001):
+    if total == 1:
+        return pos
+    offset = (index - (total - 1) / 2) * max_offset
+    return (pos[0] + offset, pos[1] + offset)
+
+
+def _offsets(index, total, max_offset=0.0001):
+    # Vectorized offset_position: the same shift applied to x and y.
+    return np.where(total == 1, 0.0, (index - (total - 1) / 2) * max_offset)
+
+
+class MapRenderer:
+    def __init__(self, pos, df, statistics, figure=None, figsize=(32, 18)):
+        self.pos = pos
+        self.df = df
+        self.statistics = statistics
+        self.figure = figure if figure is not None else plt.figure(figsize=figsize)
+        self.ax = self.figure.gca()
+        self._overlay = []
+        self._background = None
+        self.draw_base()
+        self.figure.canvas.mpl_connect('draw_event', self._on_draw)
+        self.figure.canvas.mpl_connect('button_press_event', self._on_press)
+        self.figure.canvas.mpl_connect('button_release_event', self._on_release)
+
+    def edge_segments(self):
+        df = self.df
+        keys = [df['Station from (A)'], df['Station to (B)']]
+        index = df.groupby(keys, sort=False).cumcount().to_numpy()
+        total = df.groupby(keys, sort=False)['Line'].transform('size').to_numpy()
+        offset = _offsets(index, total)[:, None]
+        start = np.array([self.pos[s] for s in df['Station from (A)']], dtype=float) + offset
+        end = np.array([self.pos[s] for s in df['Station to (B)']], dtype=float) + offset
+        colors = [line_color(line) for line in df['Line']]
+        return np.stack([start, end], axis=1), colors
+
+    def station_lines(self):
+        """{station: [line of each CSV row touching it]}."""
+        df = self.df
+        stations = np.concatenate([df['Station from (A)'].to_numpy(), df['Station to (B)'].to_numpy()])
+        lines = np.concatenate([df['Line'].to_numpy(), df['Line'].to_numpy()])
+        station_lines = {}
+        for station, line in zip(stations, lines):
+            station_lines.setdefault(station, []).append(line)
+        return station_lines
+
+    def node_styles(self, nodes, station_lines=None):
+        station_lines = self.station_lines() if station_lines is None else station_lines
+        face, edge, width = [], [], []
+        for node in nodes:
+            node_lines = station_lines.get(node, [])
+            if len(set(node_lines)) > 1:
+                face.append('white')
+                edge.append('black')
+                width.append(1.5)
+            else:
+                color = line_color(node_lines[0]) if node_lines else 'black'
+                face.append(color)
+                edge.append(color)
+                width.append(1.0)
+        return face, edge, width
+
+    def draw_base(self):
+        ax = self.ax
+        artists_before = len(ax.get_children())
+        with METRICS.timer('draw_edges'):
+            segments, colors = self.edge_segments()
+            edges = ax.add_collection(LineCollection(segments, colors=colors, linewidths=2, alpha=0.7, zorder=1))
+
+        with METRICS.timer('draw_stations'):
+            nodes = list(self.pos)
+            xy = np.array([self.pos[n] for n in nodes], dtype=float).reshape(-1, 2)
+            station_lines = self.station_lines()
+            face, edge, width = self.node_styles(nodes, station_lines)
+            stations = ax.scatter(xy[:, 0], xy[:, 1], s=50, c=face, edgecolors=edge, linewidths=width, zorder=2)
+
+        with METRICS.timer('draw_station_labels'):
+            # Interchanges win the contest for label space, then busier stations.
+            priority = [len(set(station_lines.get(node, ()))) * 100 + len(station_lines.get(node, ()))
+                        for node in nodes]
+            station_labels = LabelGroup(xy, nodes, priority, anchors=AROUND, max_labels=250, fontsize=5,
+                                        fontweight='bold',
+                                        bbox=dict(facecolor='w', edgecolor='none', alpha=0.3, pad=0.5))
+
+        with METRICS.timer('draw_edge_labels'):
+            df = self.df
+            text = df['Line'] + ': ' + df['Distance (Kms)'].astype(str)
+            edge_labels = text.groupby([df['Station from (A)'], df['Station to (B)']], sort=False).agg('\n'.join)
+            ends = np.array([(self.pos[a], self.pos[b]) for a, b in edge_labels.index], dtype=float).reshape(-1, 2, 2)
+            # Shown once the segment is as long on screen as its label is wide.
+            edge_labels = LabelGroup(ends.mean(axis=1), edge_labels.tolist(), np.hypot(*(ends[:, 1] - ends[:, 0]).T),
+                                     extent=ends[:, 1] - ends[:, 0], max_labels=100, fontsize=6)
+
+        self.labels = ax.add_artist(LabelLayer([station_labels, edge_labels]))
+
+        if METRICS.enabled:
+            _time_rendering([edges], 'render_edges')
+            _time_rendering([stations], 'render_stations')
+            _time_rendering([self.labels], 'render_labels')
+
+        legend_elements = [Line2D([], [], marker='o', color='black', label='Interchange',
+                                  markerfacecolor='white', markersize=5, linestyle='None')]
+        for line in df['Line'].unique():
+            if normalize(line) in _LINE_COLORS:
+                legend_elements.append(Line2D([0], [0], marker='o', color=line_color(line), lw=2,
+                                              label=f'{line.strip()} Line'))
+        ax.legend(handles=legend_elements, loc='lower right', fontsize=10)
+        ax.add_patch(mpatches.Rectangle((0, 0), 1, 1, transform=ax.transAxes, color='black', fill=False, linewidth=2))
+        ax.set_title('London Tube Map')
+
+        total_length, average_distance, std_distance = self.statistics
+        ax.text(0.02, 0.98, f'Total Length: {total_length:.2f} Kms', transform=ax.transAxes, fontsize=10, ha='left', va='top')
+        ax.text(0.02, 0.95, f'Average Distance: {average_distance:.2f} Kms', transform=ax.transAxes, fontsize=10, ha='left', va='top')
+        ax.text(0.02, 0.92, f'Standard Deviation: {std_distance:.2f} Kms', transform=ax.transAxes, fontsize=10, ha='left', va='top')
+
+        ax.autoscale_view()
+        ax.axis('off')
+        self.figure.tight_layout()
+        METRICS.count('artists_created', len(ax.get_children()) - artists_before)
+
+    def route_segments(self, best_route):
+        edges = list(zip(best_route[:-1], best_route[1:]))
+        total = len(edges)
+        segments = []
+        for i, (a, b) in enumerate(edges):
+            segments.append([offset_position(self.pos[a], i, total), offset_position(self.pos[b], i, total)])
+        return segments
+
+    def clear_route(self):
+        for artist in self._overlay:
+            artist.remove()
+        self._overlay = []
+
+    def show_route(self, best_route, best_distance, alternatives=()):
+        """Replace the route overlay and refresh only that layer.
+
+        ``alternatives`` is a list of ``(route, distance)`` drawn dashed under
+        the best route, one ALTERNATIVE_COLORS entry each.
+        """
+        self.clear_route()
+        canvas = self.figure.canvas
+        animated = canvas.supports_blit
+        for i, (route, _) in enumerate(alternatives):
+            color = ALTERNATIVE_COLORS[i % len(ALTERNATIVE_COLORS)]
+            collection = LineCollection(self.route_segments(route), colors=color, linewidths=3,
+                                        linestyles='dashed', alpha=0.6, zorder=2.5, animated=animated)
+            self.ax.add_collection(collection, autolim=False)
+            self._overlay.append(collection)
+        METRICS.count('artists_created', len(alternatives) + 1 + bool(best_route))
+        if best_route:
+            route = LineCollection(self.route_segments(best_route), colors=ROUTE_COLOR, linewidths=4,
+                                   alpha=0.7, zorder=3, animated=animated)
+            self.ax.add_collection(route, autolim=False)
+            self._overlay.append(route)
+        self._overlay.append(self.ax.text(0.02, 0.89, f'Best Distance: {best_distance:.2f} Kms',
+                                          transform=self.ax.transAxes, fontsize=10, ha='left', va='top',
+                                          animated=animated))
+        self._refresh_overlay()
+
+    def _refresh_overlay(self):
+        canvas = self.figure.canvas
+        if self._background is None or not canvas.supports_blit:
+            canvas.draw_idle()
+        else:
+            with METRICS.timer('blit_overlay'):
+                canvas.restore_region(self._background)
+                self._draw_overlay()
+                canvas.blit(self.figure.bbox)
+
+    def show_isochrone(self, costs, budget, unit='Kms', cmap='viridis_r'):
+        """Overlay the stations in ``costs`` ({station: cost}) coloured by cost.
+
+        One scatter carries every reachable station, so the colouring is a
+        single array mapped through ``cmap`` rather than one artist per node.
+        """
+        self.clear_route()
+        canvas = self.figure.canvas
+        animated = canvas.supports_blit
+        stations = [station for station in costs if station in self.pos]
+        if stations:
+            xy = np.array([self.pos[station] for station in stations], dtype=float)
+            values = np.array([costs[station] for station in stations], dtype=float)
+            self._overlay.append(self.ax.scatter(xy[:, 0], xy[:, 1], s=120, c=values, cmap=cmap, vmin=0,
+                                                 vmax=budget, edgecolors='black', linewidths=0.5,
+                                                 zorder=3, animated=animated))
+        self._overlay.append(self.ax.text(0.02, 0.89, f'Reachable within {budget:g} {unit}: {len(stations)} stations',
+                                          transform=self.ax.transAxes, fontsize=10, ha='left', va='top',
+                                          animated=animated))
+        self._refresh_overlay()
+
+    def show_centrality(self, values, title='Betweenness', sizes=(20.0, 600.0), cmap='plasma'):
+        """Overlay stations sized and coloured by ``values`` ({station: value})."""
+        from tube.centrality import node_sizes
+
+        self.clear_route()
+        animated = self.figure.canvas.supports_blit
+        stations = [station for station in values if station in self.pos]
+        if stations:
+            xy = np.array([self.pos[station] for station in stations], dtype=float)
+            v = np.array([values[station] for station in stations], dtype=float)
+            # Largest markers last so small stations stay visible on top.
+            order = np.argsort(-v)
+            self._overlay.append(self.ax.scatter(xy[order, 0], xy[order, 1], s=node_sizes(v, *sizes)[order],
+                                                 c=v[order], cmap=cmap, alpha=0.75, edgecolors='black',
+                                                 linewidths=0.5, zorder=3, animated=animated))
+        self._overlay.append(self.ax.text(0.02, 0.89, title, transform=self.ax.transAxes, fontsize=10,
+                                          ha='left', va='top', animated=animated))
+        self._refresh_overlay()
+
+    def route_image(self, best_route, best_distance, fmt='png', dpi=100, cache=None):
+        """The map with this route as ``fmt`` image bytes, reusing ``cache`` if given."""
+        key = (tuple(best_route or ()), best_distance, fmt, dpi)
+        if cache is not None:
+            image = cache.get(key)
+            if image is not None:
+                return image
+        self.show_route(best_route, best_distance)
+        buffer = io.BytesIO()
+        self.figure.savefig(buffer, format=fmt, dpi=dpi)
+        image = buffer.getvalue()
+        if cache is not None:
+            cache.put(key, image)
+        return image
+
+    def _draw_overlay(self):
+        for artist in self._overlay:
+            self.ax.draw_artist(artist)
+
+    def _on_press(self, event):
+        # A toolbar pan redraws on every mouse move; the labels keep the
+        # layout they had until the button is released.
+        if event.inaxes is self.ax and self.ax.get_navigate_mode() == 'PAN':
+            self.labels.dragging = True
+
+    def _on_release(self, event):
+        if self.labels.dragging:
+            self.labels.dragging = False
+            self.figure.canvas.draw_idle()
+
+    def _on_draw(self, event):
+        # A full draw (first show, resize, pan/zoom) refreshes the cached base.
+        canvas = self.figure.canvas
+        if not canvas.supports_blit or canvas.is_saving():
+            return
+        self._background = canvas.copy_from_bbox(self.figure.bbox)
+        self._draw_overlay()
@@ -0,0 +1,198 @@
+"""What-if sweep over segment and station closures.
+
+For each closure the sweep reports how many origin-destination pairs lose
+their last path and how much the remaining pairs pay on average. It starts
+from the all-pairs table (``tube.apsp``): a source's shortest-path tree
+only changes if the closed segment is one of its tree edges, or the closed
+station has children in it, so every other tree is skipped and the ones
+that did use it are repaired in place with ``live.repair_increase`` rather
+than searched from scratch. Closures are spread over a process pool::
+
+    python -m tube resilience --closures segments --top 20
+    python -m tube resilience --closures stations -o stations.jsonl
+
+Pairs are ordered (A to B and B to A both count), and pairs that start or
+end at a closed station are left out of its figures.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from tube.apsp import load_table
+from tube.live import reattach
+from tube.search import adjacency_lists
+from tube.snapshot import load_snapshot
+
+KINDS = ('segments', 'stations')
+
+_snapshot = None
+_adjacency = None
+_dist = None
+_pred = None
+_connected = None
+_order = None
+_position = None
+_size = None
+
+
+def _init_worker(distance_file, coordinates_file, zone, out_dir=None):
+    global _snapshot, _adjacency, _dist, _pred, _connected, _order, _position, _size
+    _snapshot = load_snapshot(distance_file, coordinates_file, zone, out_dir)
+    _adjacency = adjacency_lists(_snapshot)
+    # The table is memory-mapped, so workers share its pages.
+    _dist, _pred = load_table(_snapshot)
+    finite = np.isfinite(_dist)
+    np.fill_diagonal(finite, False)
+    _connected = finite
+    _order, _position, _size = preorder(_pred)
+
+
+def preorder(pred):
+    """Depth-first order of every tree in a predecessor table.
+
+    Row ``s`` of ``order`` lists tree ``s`` so that each subtree is the
+    contiguous run ``order[s, position[s, c]:position[s, c] + size[s, c]]``;
+    cutting a subtree then needs no walk over the tree. Stations the source
+    does not reach come last.
+    """
+    n = len(pred)
+    order = np.empty((n, n), dtype=np.int32)
+    position = np.empty((n, n), dtype=np.int32)
+    size = np.ones((n, n), dtype=np.int32)
+    for s in range(n):
+        row = pred[s].tolist()
+        children = [[] for _ in range(n)]
+        for v, p in enumerate(row):
+            if p >= 0 and v != s:
+                children[p].append(v)
+        visit = []
+        stack = [s]
+        while stack:
+            v = stack.pop()
+            visit.append(v)
+            stack.extend(children[v])
+        sizes = size[s]
+        for v in reversed(visit):
+            for c in children[v]:
+                sizes[v] += sizes[c]
+        reached = set(visit)
+        visit.extend(v for v in range(n) if v not in reached)
+        order[s] = visit
+        position[s, visit] = np.arange(n)
+    return order, position, size
+
+
+def _subtree(s, root):
+    members = np.zeros(len(_order), dtype=bool)
+    start = _position[s, root]
+    members[_order[s, start:start + _size[s, root]]] = True
+    return members
+
+
+def _detach(u, neighbours):
+    # Drop u's segments to ``neighbours``; returns what to put back.
+    removed = {}
+    for v in neighbours:
+        removed[v] = _adjacency[v]
+        _adjacency[v] = [(x, w) for x, w in _adjacency[v] if x != u]
+    removed[u] = _adjacency[u]
+    _adjacency[u] = [(x, w) for x, w in _adjacency[u] if x not in neighbours]
+    return removed
+
+
+def _impact(sources, roots, excluded=None):
+    """Re-search the subtree under ``roots[i]`` in tree ``sources[i]`` and sum the damage."""
+    disconnected = 0
+    extra = 0.0
+    for s, root in zip(sources.tolist(), roots.tolist()):
+        dist, pred = np.array(_dist[s]), np.array(_pred[s])
+        reattach(_adjacency, dist, pred, _subtree(s, root))
+        lost = _connected[s] & ~np.isfinite(dist)
+        if excluded is not None:
+            lost[excluded] = False
+        kept = _connected[s] & ~lost
+        if excluded is not None:
+            kept[excluded] = False
+        disconnected += int(lost.sum())
+        extra += float((dist[kept] - _dist[s][kept]).sum())
+    return disconnected, extra
+
+
+def _close_segment(u, v):
+    # Trees where u-v is a tree edge, in either direction.
+    below_u, below_v = _pred[:, v] == u, _pred[:, u] == v
+    sources = np.flatnonzero(below_u | below_v)
+    roots = np.where(below_u[sources], v, u)
+    restore = _detach(u, {v})
+    try:
+        disconnected, extra = _impact(sources, roots)
+    finally:
+        for x, edges in restore.items():
+            _adjacency[x] = edges
+    stations = _snapshot.stations
+    pairs = int(_connected.sum()) - disconnected
+    return {'closure': 'segment', 'from': stations[u], 'to': stations[v], 'disconnected_pairs': disconnected,
+            'extra_cost': extra, 'mean_increase': extra / pairs if pairs else 0.0,
+            'trees_repaired': len(sources)}
+
+
+def _close_station(x):
+    # Trees where x has children, other than x's own; x's whole subtree is
+    # searched again with x detached, and x's own pairs are dropped.
+    uses = _pred == x
+    uses[x] = False
+    sources = np.flatnonzero(uses.any(axis=1))
+    neighbours = {y for y, _ in _adjacency[x]}
+    restore = _detach(x, neighbours)
+    try:
+        disconnected, extra = _impact(sources, np.full(len(sources), x), excluded=x)
+    finally:
+        for y, edges in restore.items():
+            _adjacency[y] = edges
+    pairs = int(_connected.sum()) - int(_connected[x].sum()) - int(_connected[:, x].sum()) - disconnected
+    return {'closure': 'station', 'station': _snapshot.stations[x], 'disconnected_pairs': disconnected,
+            'extra_cost': extra, 'mean_increase': extra / pairs if pairs else 0.0,
+            'trees_repaired': len(sources)}
+
+
+def _solve(closure):
+    return _close_station(closure[0]) if len(closure) == 1 else _close_segment(*closure)
+
+
+def closures(snapshot, kind='segments'):
+    """Station id tuples to close: (u, v) per undirected segment, or (x,) per station."""
+    if kind == 'stations':
+        return [(x,) for x in range(snapshot.num_stations)]
+    indptr, indices = snapshot.indptr.tolist(), snapshot.indices.tolist()
+    return sorted({(u, v) for u in range(snapshot.num_stations) for v in indices[indptr[u]:indptr[u + 1]] if u < v})
+
+
+def sweep(snapshot, kind='segments', workers=None, distance_file='distance.csv', coordinates_file='stations.csv',
+          chunk_size=16):
+    """Close each segment or station in turn; yields one result dict per closure.
+
+    Results come in closure order. ``workers=0`` runs in this process.
+    """
+    if kind not in KINDS:
+        raise ValueError(f'unknown closure kind {kind!r}, expected one of {KINDS}')
+    # Build the shared table once here rather than racing to build it in every worker.
+    load_table(snapshot)
+    jobs = closures(snapshot, kind)
+    initargs = (distance_file, coordinates_file, snapshot.zone_arg, snapshot.path)
+    if workers == 0:
+        _init_worker(*initargs)
+        yield from map(_solve, jobs)
+        return
+    with ProcessPoolExecutor(workers or os.cpu_count() or 1, initializer=_init_worker,
+                             initargs=initargs) as executor:
+        yield from executor.map(_solve, jobs, chunksize=chunk_size)
+
+
+def baseline(snapshot):
+    """Connected ordered pairs and their mean cost on the intact network."""
+    dist, _ = load_table(snapshot)
+    finite = np.isfinite(dist)
+    np.fill_diagonal(finite, False)
+    pairs = int(finite.sum())
+    return pairs, float(np.asarray(dist)[finite].mean()) if pairs else 0.0
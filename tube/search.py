@@ -0,0 +1,261 @@
+"""Point-to-point searches over the snapshot adjacency.
+
+Each search returns ``(path, distance, settled)`` from a single traversal:
+station ids along the path (``None`` if unreachable), the path cost and the
+number of nodes settled, which is what drives query latency as the network
+grows.
+"""
+import heapq
+import math
+
+import numpy as np
+
+
+def adjacency_lists(snapshot, weight=None):
+    # Plain Python lists beat indexing the memory-mapped arrays inside a heap loop.
+    edge_weight = np.asarray(snapshot.edge_distance if weight is None else weight).tolist()
+    indptr = snapshot.indptr.tolist()
+    indices = snapshot.indices.tolist()
+    adj_edge = snapshot.adj_edge.tolist()
+    return [
+        [(indices[k], edge_weight[adj_edge[k]]) for k in range(indptr[i], indptr[i + 1])]
+        for i in range(snapshot.num_stations)
+    ]
+
+
+def adjacency_edges(snapshot):
+    # Like adjacency_lists but keeps the edge row, so weights can be swapped per query.
+    indptr = snapshot.indptr.tolist()
+    indices = snapshot.indices.tolist()
+    adj_edge = snapshot.adj_edge.tolist()
+    return [
+        [(indices[k], adj_edge[k]) for k in range(indptr[i], indptr[i + 1])]
+        for i in range(snapshot.num_stations)
+    ]
+
+
+def unwind_path(pred, node):
+    """The path to ``node`` as a node list, following ``pred`` back to a -1."""
+    path = []
+    while node != -1:
+        path.append(node)
+        node = pred[node]
+    path.reverse()
+    return path
+
+
+def dijkstra(adjacency, source, target):
+    dist = {source: 0.0}
+    pred = {source: -1}
+    settled = set()
+    heap = [(0.0, source)]
+    while heap:
+        d, u = heapq.heappop(heap)
+        if u in settled:
+            continue
+        settled.add(u)
+        if u == target:
+            return unwind_path(pred, u), d, len(settled)
+        for v, w in adjacency[u]:
+            nd = d + w
+            if nd < dist.get(v, math.inf):
+                dist[v] = nd
+                pred[v] = u
+                heapq.heappush(heap, (nd, v))
+    return None, math.inf, len(settled)
+
+
+def multi_source_dijkstra(adjacency, sources, target):
+    # sources maps station id -> starting cost, e.g. the walk to that station;
+    # one search covers all of them, and the path starts at whichever wins.
+    dist = dict(sources)
+    pred = {source: -1 for source in sources}
+    settled = set()
+    heap = [(cost, source) for source, cost in sources.items()]
+    heapq.heapify(heap)
+    while heap:
+        d, u = heapq.heappop(heap)
+        if u in settled:
+            continue
+        settled.add(u)
+        if u == target:
+            return unwind_path(pred, u), d, len(settled)
+        for v, w in adjacency[u]:
+            nd = d + w
+            if nd < dist.get(v, math.inf):
+                dist[v] = nd
+                pred[v] = u
+                heapq.heappush(heap, (nd, v))
+    return None, math.inf, len(settled)
+
+
+def shortest_path_tree(adjacency, source, targets=None, max_cost=None):
+    # Single-source Dijkstra; with targets it stops once all of them are
+    # settled, with max_cost once the next node would cost more than that.
+    dist = {source: 0.0}
+    pred = {source: -1}
+    settled = set()
+    remaining = set(targets) if targets is not None else None
+    heap = [(0.0, source)]
+    while heap:
+        d, u = heapq.heappop(heap)
+        if u in settled:
+            continue
+        if max_cost is not None and d > max_cost:
+            break
+        settled.add(u)
+        if remaining is not None:
+            remaining.discard(u)
+            if not remaining:
+                break
+        for v, w in adjacency[u]:
+            nd = d + w
+            if nd < dist.get(v, math.inf):
+                dist[v] = nd
+                pred[v] = u
+                heapq.heappush(heap, (nd, v))
+    return {u: dist[u] for u in settled}, pred
+
+
+def tree_path(pred, dist, target):
+    if target not in dist:
+        return None
+    return unwind_path(pred, target)
+
+
+def time_dependent_dijkstra(adjacency, weights, profile_at, source, target, departure):
+    # Labels are arrival times in minutes; each edge is costed with the
+    # weight list of the profile in force when the train leaves its tail.
+    # Within one period this is plain Dijkstra. Across a period boundary a
+    # step change in running time can let a slightly later departure arrive
+    # earlier; waiting is not modelled, so such routes are near-optimal.
+    arrival = {source: departure}
+    pred = {source: -1}
+    settled = set()
+    heap = [(departure, source)]
+    while heap:
+        t, u = heapq.heappop(heap)
+        if u in settled:
+            continue
+        settled.add(u)
+        if u == target:
+            return unwind_path(pred, u), t - departure, len(settled)
+        weight = weights[profile_at(t)]
+        for v, e in adjacency[u]:
+            nt = t + weight[e]
+            if nt < arrival.get(v, math.inf):
+                arrival[v] = nt
+                pred[v] = u
+                heapq.heappush(heap, (nt, v))
+    return None, math.inf, len(settled)
+
+
+def heuristic_scale(snapshot, weight=None):
+    # Straight-line distance in km times this factor never exceeds any edge
+    # weight, so the heuristic stays admissible (and consistent) even where a
+    # CSV distance is shorter than the OS grid distance between its stations.
+    edge_weight = np.asarray(snapshot.edge_distance if weight is None else weight)
+    straight = np.hypot(snapshot.os_x[snapshot.edge_src] - snapshot.os_x[snapshot.edge_dst],
+                        snapshot.os_y[snapshot.edge_src] - snapshot.os_y[snapshot.edge_dst]) / 1000.0
+    positive = straight > 0
+    if not positive.any():
+        return 0.0
+    return float(min(1.0, (edge_weight[positive] / straight[positive]).min()))
+
+
+def astar(adjacency, source, target, os_x, os_y, scale):
+    tx, ty = os_x[target], os_y[target]
+    scale = scale / 1000.0
+
+    def h(u):
+        return math.hypot(os_x[u] - tx, os_y[u] - ty) * scale
+
+    dist = {source: 0.0}
+    pred = {source: -1}
+    settled = set()
+    heap = [(h(source), source)]
+    while heap:
+        _, u = heapq.heappop(heap)
+        if u in settled:
+            continue
+        settled.add(u)
+        d = dist[u]
+        if u == target:
+            return unwind_path(pred, u), d, len(settled)
+        for v, w in adjacency[u]:
+            nd = d + w
+            if nd < dist.get(v, math.inf):
+                dist[v] = nd
+                pred[v] = u
+                heapq.heappush(heap, (nd + h(v), v))
+    return None, math.inf, len(settled)
+
+
+def bidirectional_dijkstra(adjacency, source, target):
+    if source == target:
+        return [source], 0.0, 1
+    # The network is undirected, so both frontiers walk the same adjacency.
+    dist = ({source: 0.0}, {target: 0.0})
+    pred = ({source: -1}, {target: -1})
+    settled = (set(), set())
+    heaps = ([(0.0, source)], [(0.0, target)])
+    best, meet = math.inf, None
+    while heaps[0] and heaps[1]:
+        if heaps[0][0][0] + heaps[1][0][0] >= best:
+            break
+        side = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+        d, u = heapq.heappop(heaps[side])
+        if u in settled[side]:
+            continue
+        settled[side].add(u)
+        other = dist[1 - side]
+        for v, w in adjacency[u]:
+            nd = d + w
+            if nd < dist[side].get(v, math.inf):
+                dist[side][v] = nd
+                pred[side][v] = u
+                heapq.heappush(heaps[side], (nd, v))
+            if v in other and nd + other[v] < best:
+                best, meet = nd + other[v], (side, u, v)
+    count = len(settled[0]) + len(settled[1])
+    if meet is None:
+        return None, math.inf, count
+    # The best path crosses the edge u-v, with u on the side that relaxed it.
+    side, u, v = meet
+    if side == 1:
+        u, v = v, u
+    forward = unwind_path(pred[0], u)
+    backward = unwind_path(pred[1], v)
+    backward.reverse()
+    return forward + backward, best, count
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    from tube.snapshot import load_snapshot
+
+    parser = argparse.ArgumentParser(description='Compare settled-node counts of the point-to-point searches.')
+    parser.add_argument('--zone', default='1')
+    parser.add_argument('--queries', type=int, default=1000)
+    args = parser.parse_args()
+
+    snapshot = load_snapshot(zone=args.zone)
+    adjacency = adjacency_lists(snapshot)
+    os_x, os_y = snapshot.os_x.tolist(), snapshot.os_y.tolist()
+    scale = heuristic_scale(snapshot)
+    searches = {
+        'dijkstra': lambda s, t: dijkstra(adjacency, s, t),
+        'astar': lambda s, t: astar(adjacency, s, t, os_x, os_y, scale),
+        'bidirectional': lambda s, t: bidirectional_dijkstra(adjacency, s, t),
+    }
+    pairs = np.random.default_rng(0).integers(0, snapshot.num_stations, size=(args.queries, 2)).tolist()
+    for name, search in searches.items():
+        counts = []
+        start = time.perf_counter()
+        for source, target in pairs:
+            counts.append(search(source, target)[2])
+        elapsed = (time.perf_counter() - start) / len(pairs)
+        print(f'{name:14s} settled mean {np.mean(counts):6.1f}  p99 {np.percentile(counts, 99):6.1f}  '
+              f'{elapsed * 1e6:7.1f} us/query')
@@ -0,0 +1,257 @@
+"""Local HTTP/JSON route service.
+
+Loads the snapshot once and answers route, distance and statistics
+queries over HTTP/1.1 with keep-alive, on the standard library's asyncio
+streams::
+
+    python -m tube --zone all serve --port 8765
+    curl 'http://127.0.0.1:8765/route?from=BANK&to=baker+street'
+
+Endpoints (GET with query parameters, or POST with a JSON object):
+
+    /route?from=A&to=B     {"from", "to", "route": [...] or null, "distance"}
+    /distance?from=A&to=B  {"from", "to", "distance"} (null if unreachable)
+    /stats                 segment length statistics of the loaded network
+    /health                cache and coalescing counters
+
+Station names go through ``NameIndex``, so 'baker street' finds 'BAKER
+STREET'. Searches run in a process pool (``workers=0`` answers them on the
+event loop instead). Answers are kept in a RouteCache, and identical
+queries that arrive while one is being searched wait on that one search
+instead of starting their own.
+"""
+import asyncio
+import json
+import os
+import sys
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+
+from tube.cache import RouteCache
+from tube.metrics import METRICS
+from tube.network import StationNotFound
+from tube.snapshot import load_snapshot
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 431: 'Request Header Fields Too Large', 500: 'Internal Server Error'}
+
+# Largest request body accepted, in bytes.
+MAX_BODY = 64 * 1024
+
+_engine = None
+
+
+def _init_worker(distance_file, coordinates_file, zone, engine, out_dir=None):
+    global _engine
+    from tube.engines import make_engine
+
+    _engine = make_engine(engine, load_snapshot(distance_file, coordinates_file, zone, out_dir))
+
+
+def _route(start, end):
+    return _engine.route(start, end)
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class RouteService:
+    """The query side of the server, independent of HTTP."""
+
+    def __init__(self, snapshot, engine='bidirectional', workers=None, distance_file='distance.csv',
+                 coordinates_file='stations.csv', cache_size=4096):
+        self.snapshot = snapshot
+        self.engine = engine
+        self.names = snapshot.names
+        self.cache = RouteCache(cache_size, dataset_hash=snapshot.source_hash)
+        self.coalesced = 0
+        self._inflight = {}
+        # Building the engine here writes its on-disk tables (hierarchy, line
+        # graph, all-pairs table) once, before any worker starts; the workers
+        # then only load them.
+        from tube.engines import make_engine
+
+        built = make_engine(engine, snapshot)
+        if workers == 0:
+            global _engine
+            _engine = built
+            self.executor = None
+        else:
+            initargs = (distance_file, coordinates_file, snapshot.zone_arg, engine, snapshot.path)
+            self.executor = ProcessPoolExecutor(workers or os.cpu_count() or 1, initializer=_init_worker,
+                                                initargs=initargs)
+
+        distance = np.asarray(snapshot.edge_distance)
+        # Same figures as network.calculate_statistics (pandas' std is the sample std).
+        self.statistics = {
+            'stations': snapshot.num_stations,
+            'segments': len(distance),
+            'total_length': float(distance.sum()),
+            'average_distance': float(distance.mean()) if len(distance) else None,
+            'std_distance': float(distance.std(ddof=1)) if len(distance) > 1 else None,
+        }
+
+    async def route(self, start, end):
+        """``(start, end, best_route, best_distance)`` with the names resolved."""
+        start, end = self.names.resolve(start), self.names.resolve(end)
+        cached = self.cache.get_route(start, end, self.engine)
+        if cached is not None:
+            return (start, end, *cached)
+        key = (start, end)
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._search(start, end))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+            METRICS.count('coalesced_requests')
+        # Shielded, so one client hanging up does not cancel the others' search.
+        best_route, best_distance = await asyncio.shield(future)
+        return start, end, best_route, best_distance
+
+    async def _search(self, start, end):
+        if self.executor is None:
+            best_route, best_distance = _route(start, end)
+        else:
+            loop = asyncio.get_running_loop()
+            best_route, best_distance = await loop.run_in_executor(self.executor, _route, start, end)
+        self.cache.put_route(start, end, self.engine, best_route, best_distance)
+        return best_route, best_distance
+
+    def health(self):
+        return {'status': 'ok', 'engine': self.engine, 'dataset': self.snapshot.source_hash,
+                'in_flight': len(self._inflight), 'coalesced': self.coalesced, 'cache': self.cache.stats()}
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+
+
+def _pair(params):
+    start, end = params.get('from'), params.get('to')
+    if not (isinstance(start, str) and isinstance(end, str)):
+        raise HTTPError(400, "expected 'from' and 'to' station names")
+    return start, end
+
+
+async def dispatch(service, method, path, params):
+    """Answer one request; returns ``(status, payload)``."""
+    if method not in ('GET', 'POST'):
+        raise HTTPError(405, f'{method} is not supported')
+    if path == '/route':
+        start, end, best_route, best_distance = await service.route(*_pair(params))
+        return 200, {'from': start, 'to': end, 'route': best_route,
+                     'distance': best_distance if best_route else None}
+    if path == '/distance':
+        start, end, best_route, best_distance = await service.route(*_pair(params))
+        return 200, {'from': start, 'to': end, 'distance': best_distance if best_route else None}
+    if path == '/stats':
+        return 200, service.statistics
+    if path == '/health':
+        return 200, service.health()
+    raise HTTPError(404, f'no endpoint {path}')
+
+
+async def _readline(reader, status, message):
+    # readline raises ValueError for a line over the stream's limit.
+    try:
+        return await reader.readline()
+    except ValueError:
+        raise HTTPError(status, message) from None
+
+
+async def _read_request(reader):
+    # Returns (method, target, version, headers, body), or None at end of stream.
+    request_line = await _readline(reader, 400, 'request line too long')
+    if not request_line.strip():
+        return None
+    try:
+        method, target, version = request_line.decode('latin1').split()
+    except ValueError:
+        raise HTTPError(400, 'malformed request line') from None
+    headers = {}
+    while True:
+        line = await _readline(reader, 431, 'header line too long')
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get('content-length') or 0)
+    except ValueError:
+        raise HTTPError(400, 'bad Content-Length') from None
+    if length < 0:
+        raise HTTPError(400, 'bad Content-Length')
+    if length > MAX_BODY:
+        raise HTTPError(413, f'request body over {MAX_BODY} bytes')
+    body = await reader.readexactly(length) if length else b''
+    return method, target, version, headers, body
+
+
+def _response(status, payload, keep_alive):
+    body = json.dumps(payload).encode()
+    head = (f'HTTP/1.1 {status} {REASONS.get(status, "")}\r\n'
+            f'Content-Type: application/json\r\n'
+            f'Content-Length: {len(body)}\r\n'
+            f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n')
+    return head.encode('latin1') + body
+
+
+async def handle_connection(service, reader, writer, idle_timeout=30.0):
+    """Serve requests on one connection until the client closes it or goes idle."""
+    try:
+        while True:
+            try:
+                request = await asyncio.wait_for(_read_request(reader), idle_timeout)
+            except HTTPError as error:
+                writer.write(_response(error.status, {'error': str(error)}, False))
+                break
+            if request is None:
+                break
+            method, target, version, headers, body = request
+            connection = headers.get('connection', '').lower()
+            keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+            url = urlsplit(target)
+            params = dict(parse_qsl(url.query))
+            METRICS.count('http_requests')
+            try:
+                if body:
+                    try:
+                        params.update(json.loads(body))
+                    except (ValueError, TypeError):
+                        raise HTTPError(400, 'request body is not a JSON object') from None
+                with METRICS.timer('http_request'):
+                    status, payload = await dispatch(service, method.upper(), url.path, params)
+            except HTTPError as error:
+                status, payload = error.status, {'error': str(error)}
+            except StationNotFound as error:
+                status, payload = 404, {'error': error.args[0]}
+            except Exception:
+                # Answer rather than drop the connection, and keep serving.
+                print(f'Error answering {method} {target}:', file=sys.stderr)
+                traceback.print_exc()
+                status, payload = 500, {'error': 'internal server error'}
+            writer.write(_response(status, payload, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(service, host='127.0.0.1', port=8765, ready=None):
+    """Run the HTTP server until cancelled. ``ready`` is called with the bound port."""
+    server = await asyncio.start_server(lambda r, w: handle_connection(service, r, w), host, port)
+    if ready is not None:
+        ready(server.sockets[0].getsockname()[1])
+    async with server:
+        await server.serve_forever()
@@ -0,0 +1,311 @@
+"""Compiled, memory-mapped snapshot of the filtered tube network.
+
+Parsing distance.csv/stations.csv and building the graph dominates cold
+start, so ``build_snapshot`` does it once and writes plain ``.npy`` arrays
+(CSR adjacency, station table, per-edge columns) plus a small ``meta.json``.
+``load_snapshot`` memory-maps those arrays and rebuilds them automatically
+when the source CSVs change.
+"""
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from tube.metrics import METRICS
+from tube.names import NameIndex, match_names
+from tube.network import ALL_ZONES, filter_edges, load_coordinates, load_data, load_station_zones, zone_filter, zone_sort_key
+
+SNAPSHOT_VERSION = 4
+SNAPSHOT_DIR = '.snapshot'
+
+RUNNING_TIME_COLUMNS = [
+    'Un-impeded Running Time (Mins)',
+    'AM peak (0700-1000) Running Time (Mins)',
+    'Inter peak (1000 - 1600) Running time (mins)',
+]
+
+_ARRAYS = [
+    'os_x', 'os_y',                                 # per station
+    'edge_row', 'edge_src', 'edge_dst', 'edge_distance',
+    'edge_line', 'edge_direction', 'edge_running_time',  # per CSV row
+    'indptr', 'indices', 'adj_edge',                # CSR adjacency
+    'zone_indptr', 'zone_stations',                 # zone partitions
+]
+
+
+def source_hash(*paths):
+    h = hashlib.sha1()
+    for path in paths:
+        with open(path, 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def zone_label(zone):
+    zones = zone_filter(zone)
+    return ALL_ZONES if zones is None else '+'.join(sorted(zones, key=zone_sort_key))
+
+
+def snapshot_path(zone='1', root=SNAPSHOT_DIR):
+    return os.path.join(root, f'zone-{zone_label(zone)}')
+
+
+def atomic_write(path, write):
+    """Write ``path`` through ``write(file)`` on a temporary file, then swap it in.
+
+    Readers that still have the old file mapped keep a valid inode, and
+    the temporary name is private to this writer, so processes building
+    the same file at once (pool workers on a cold snapshot) do not trip
+    over each other's half-written files.
+    """
+    directory, name = os.path.split(path)
+    fd, tmp = tempfile.mkstemp(dir=directory or '.', prefix=f'.{name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp)
+        raise
+
+
+def weight_name(weight):
+    """Cache-file name for per-edge ``weight``: 'distance' for None, else a digest of the values."""
+    if weight is None:
+        return 'distance'
+    return 'w' + hashlib.sha1(np.ascontiguousarray(weight, dtype=np.float64).tobytes()).hexdigest()[:12]
+
+
+def _save_array(out_dir, name, array):
+    atomic_write(os.path.join(out_dir, f'{name}.npy'), lambda f: np.save(f, array))
+
+
+def build_snapshot(distance_file='distance.csv', coordinates_file='stations.csv', zone='1', out_dir=None):
+    import pandas as pd
+
+    out_dir = out_dir or snapshot_path(zone)
+    os.makedirs(out_dir, exist_ok=True)
+
+    station_coordinates = load_coordinates(coordinates_file, zone)
+    station_zones = load_station_zones(coordinates_file, zone)
+    df = load_data(distance_file)
+
+    # distance.csv spells some stations differently from stations.csv, and
+    # names some platforms apart ('EUSTON (CX)', 'EUSTON (CITY)'). Rewrite
+    # those to the stations.csv name, so their edges are kept and the
+    # platforms are one station. Matching runs against every station, so a
+    # name is never resolved just because its rivals are in another zone.
+    names = pd.unique(df[['Station from (A)', 'Station to (B)']].to_numpy().ravel())
+    renames = match_names(names, load_station_zones(coordinates_file))
+    if renames:
+        df = df.copy()
+        for column in ('Station from (A)', 'Station to (B)'):
+            df[column] = df[column].replace(renames)
+        df = df[df['Station from (A)'] != df['Station to (B)']]
+    df = filter_edges(df, station_coordinates)
+
+    # Station ids follow the order nx.Graph.add_edge would insert the nodes in.
+    endpoints = np.column_stack([df['Station from (A)'].to_numpy(), df['Station to (B)'].to_numpy()]).ravel()
+    stations = list(pd.unique(endpoints))
+    station_id = {name: i for i, name in enumerate(stations)}
+    lines = list(pd.unique(df['Line']))
+    directions = list(pd.unique(df['Direction']))
+
+    src = df['Station from (A)'].map(station_id).to_numpy(np.int32)
+    dst = df['Station to (B)'].map(station_id).to_numpy(np.int32)
+    n = len(stations)
+
+    # The graph is undirected and a later CSV row overwrites an earlier one on
+    # the same pair, so each adjacency entry points at the last row for it.
+    lo, hi = np.minimum(src, dst), np.maximum(src, dst)
+    pair = lo.astype(np.int64) * n + hi
+    _, last = np.unique(pair[::-1], return_index=True)
+    last = len(pair) - 1 - last
+    rows = np.concatenate([last, last])
+    heads = np.concatenate([lo[last], hi[last]])
+    tails = np.concatenate([hi[last], lo[last]])
+    order = np.lexsort((tails, heads))
+    heads, tails, rows = heads[order], tails[order], rows[order]
+    indptr = np.zeros(n + 1, dtype=np.int32)
+    np.cumsum(np.bincount(heads, minlength=n), out=indptr[1:])
+
+    # Zone partitions: zone_indptr[k]:zone_indptr[k + 1] slices the station
+    # ids of zones[k]. A boundary station appears in each of its zones.
+    zones = sorted({z for s in stations for z in station_zones[s]}, key=zone_sort_key)
+    zone_members = {z: [] for z in zones}
+    for i, s in enumerate(stations):
+        for z in station_zones[s]:
+            zone_members[z].append(i)
+    zone_indptr = np.zeros(len(zones) + 1, dtype=np.int32)
+    np.cumsum([len(zone_members[z]) for z in zones], out=zone_indptr[1:])
+    zone_stations = np.array([i for z in zones for i in zone_members[z]], dtype=np.int32)
+
+    arrays = {
+        'os_x': np.array([station_coordinates[s][0] for s in stations], dtype=np.float64),
+        'os_y': np.array([station_coordinates[s][1] for s in stations], dtype=np.float64),
+        'edge_row': df.index.to_numpy(np.int32),
+        'edge_src': src,
+        'edge_dst': dst,
+        'edge_distance': df['Distance (Kms)'].to_numpy(np.float64),
+        'edge_line': df['Line'].map({line: i for i, line in enumerate(lines)}).to_numpy(np.int16),
+        'edge_direction': df['Direction'].map({d: i for i, d in enumerate(directions)}).to_numpy(np.int16),
+        'edge_running_time': df[RUNNING_TIME_COLUMNS].to_numpy(np.float64),
+        'indptr': indptr,
+        'indices': tails.astype(np.int32),
+        'adj_edge': rows.astype(np.int32),
+        'zone_indptr': zone_indptr,
+        'zone_stations': zone_stations,
+    }
+    # Tables, hierarchies and line graphs from an earlier build are keyed by
+    # source hash only, so they go with the arrays they were derived from.
+    # Files for this hash may come from a build running alongside; they are
+    # kept only if the directory last held this zone at this version, since
+    # another zone or snapshot version numbers the stations differently.
+    digest = source_hash(distance_file, coordinates_file)
+    previous = _read_meta(out_dir)
+    renumbered = (previous is None or previous.get('version') != SNAPSHOT_VERSION
+                  or previous.get('zone') != zone_label(zone))
+    for entry in os.listdir(out_dir):
+        if entry.endswith(('.npy', '.npz')) and entry[:-4] not in arrays and (renumbered or digest[:12] not in entry):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(out_dir, entry))
+    for name, array in arrays.items():
+        _save_array(out_dir, name, array)
+
+    meta = {
+        'version': SNAPSHOT_VERSION,
+        'source_hash': digest,
+        'zone': zone_label(zone),
+        'zones': zones,
+        'stations': stations,
+        'lines': lines,
+        'directions': directions,
+    }
+    # meta.json goes last: a snapshot only counts as valid once it is written.
+    atomic_write(os.path.join(out_dir, 'meta.json'), lambda f: f.write(json.dumps(meta).encode()))
+    return out_dir
+
+
+def _read_meta(out_dir):
+    try:
+        with open(os.path.join(out_dir, 'meta.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def load_snapshot(distance_file='distance.csv', coordinates_file='stations.csv', zone='1', out_dir=None):
+    out_dir = out_dir or snapshot_path(zone)
+    digest = source_hash(distance_file, coordinates_file)
+    meta = _read_meta(out_dir)
+    # An explicit out_dir may hold a build for another zone.
+    if (meta is None or meta.get('version') != SNAPSHOT_VERSION or meta.get('source_hash') != digest
+            or meta.get('zone') != zone_label(zone)):
+        with METRICS.timer('build_snapshot'):
+            build_snapshot(distance_file, coordinates_file, zone, out_dir)
+        meta = _read_meta(out_dir)
+    with METRICS.timer('load_snapshot'):
+        arrays = {name: np.load(os.path.join(out_dir, f'{name}.npy'), mmap_mode='r') for name in _ARRAYS}
+    return Snapshot(meta, arrays, out_dir)
+
+
+class Snapshot:
+    def __init__(self, meta, arrays, path):
+        self.path = path
+        self.source_hash = meta['source_hash']
+        self.zone = meta['zone']
+        self.zones = meta['zones']
+        self.stations = meta['stations']
+        self.lines = meta['lines']
+        self.directions = meta['directions']
+        self.station_id = {name: i for i, name in enumerate(self.stations)}
+        self._names = None
+        for name, array in arrays.items():
+            setattr(self, name, array)
+
+    @property
+    def zone_arg(self):
+        """The ``zone`` argument that loads this snapshot again: '1,2' for label '1+2'."""
+        return self.zone.replace('+', ',')
+
+    @property
+    def names(self):
+        """The ``NameIndex`` over the stations, built once per snapshot on first use."""
+        if self._names is None:
+            self._names = NameIndex(self.stations)
+        return self._names
+
+    @property
+    def num_stations(self):
+        return len(self.stations)
+
+    @property
+    def num_edges(self):
+        return len(self.edge_src)
+
+    def neighbours(self, i):
+        start, end = self.indptr[i], self.indptr[i + 1]
+        return self.indices[start:end], self.adj_edge[start:end]
+
+    def zone_members(self, zone):
+        k = self.zones.index(zone)
+        return self.zone_stations[self.zone_indptr[k]:self.zone_indptr[k + 1]]
+
+    def station_zones(self):
+        # Zone indices per station id, built from the partition arrays.
+        result = [[] for _ in self.stations]
+        for k in range(len(self.zones)):
+            for i in self.zone_stations[self.zone_indptr[k]:self.zone_indptr[k + 1]].tolist():
+                result[i].append(k)
+        return result
+
+    def station_coordinates(self):
+        return dict(zip(self.stations, zip(self.os_x.tolist(), self.os_y.tolist())))
+
+    def to_graph(self):
+        import networkx as nx
+
+        g = nx.Graph()
+        with METRICS.timer('build_graph'):
+            g.add_nodes_from(self.stations)
+            stations, lines = self.stations, self.lines
+            # Adding every row in CSV order keeps nx.Graph's last-row-wins semantics.
+            g.add_edges_from(
+                (stations[a], stations[b], {'weight': w, 'line': lines[l]})
+                for a, b, w, l in zip(self.edge_src.tolist(), self.edge_dst.tolist(),
+                                      self.edge_distance.tolist(), self.edge_line.tolist())
+            )
+        return g
+
+    def frame(self):
+        import pandas as pd
+
+        stations = np.array(self.stations, dtype=object)
+        running_time = np.asarray(self.edge_running_time)
+        data = {
+            'Line': np.array(self.lines, dtype=object)[self.edge_line],
+            'Direction': np.array(self.directions, dtype=object)[self.edge_direction],
+            'Station from (A)': stations[self.edge_src],
+            'Station to (B)': stations[self.edge_dst],
+            'Distance (Kms)': np.asarray(self.edge_distance),
+        }
+        for i, column in enumerate(RUNNING_TIME_COLUMNS):
+            data[column] = running_time[:, i]
+        return pd.DataFrame(data, index=np.asarray(self.edge_row))
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Compile the tube network into a binary snapshot.')
+    parser.add_argument('--distances', default='distance.csv')
+    parser.add_argument('--stations', default='stations.csv')
+    parser.add_argument('--zone', default='1', help="zone label, a list such as '1,2', or 'all'")
+    parser.add_argument('--out', default=None)
+    args = parser.parse_args()
+    path = build_snapshot(args.distances, args.stations, args.zone, args.out)
+    print(f'Snapshot written to {path}')
@@ -0,0 +1,129 @@
+"""Travel-time routing on the running-time columns of distance.csv.
+
+distance.csv has three running-time profiles per segment. Each profile's
+weights are gathered into one list up front, so routing at a different
+time of day only changes which list a search reads, never the graph.
+"""
+import datetime
+import re
+
+import numpy as np
+
+from tube.network import StationNotFound
+from tube.search import adjacency_edges, time_dependent_dijkstra
+
+# Profile name -> column index into Snapshot.edge_running_time.
+PROFILES = {
+    'unimpeded': 0,
+    'am_peak': 1,
+    'inter_peak': 2,
+}
+
+# (start, end, profile) in minutes after midnight. The data has no PM peak or
+# evening column, so any other time uses OFF_PEAK_PROFILE.
+PERIODS = [
+    (7 * 60, 10 * 60, 'am_peak'),
+    (10 * 60, 16 * 60, 'inter_peak'),
+]
+OFF_PEAK_PROFILE = 'inter_peak'
+
+
+def departure_minutes(departure):
+    """Minutes after midnight for a datetime, time, 'HH:MM' string or number.
+
+    Raises ValueError for a string that is not a 24-hour HH:MM time.
+    """
+    if isinstance(departure, datetime.datetime):
+        departure = departure.time()
+    if isinstance(departure, datetime.time):
+        return departure.hour * 60 + departure.minute + departure.second / 60
+    if isinstance(departure, str):
+        match = re.fullmatch(r'\s*(\d{1,2}):(\d{2})\s*', departure)
+        if match is None or int(match[1]) > 23 or int(match[2]) > 59:
+            raise ValueError(f'departure time must be HH:MM between 00:00 and 23:59, not {departure!r}')
+        return int(match[1]) * 60 + int(match[2])
+    return float(departure)
+
+
+def profile_at(minutes):
+    minutes %= 24 * 60
+    for start, end, profile in PERIODS:
+        if start <= minutes < end:
+            return profile
+    return OFF_PEAK_PROFILE
+
+
+def profile_weights(snapshot):
+    running_time = np.asarray(snapshot.edge_running_time)
+    return {name: running_time[:, column].tolist() for name, column in PROFILES.items()}
+
+
+class TravelTimeRouter:
+    """Route by running time in minutes for a given departure time."""
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.adjacency = adjacency_edges(snapshot)
+        self.weights = profile_weights(snapshot)
+        self.settled = 0
+
+    def _station_ids(self, start_station, end_station):
+        station_id = self.snapshot.station_id
+        for station in (start_station, end_station):
+            if station not in station_id:
+                raise StationNotFound(f'{station} is not in the network')
+        return station_id[start_station], station_id[end_station]
+
+    def route(self, start_station, end_station, departure):
+        """Return ``(best_route, minutes)`` leaving at ``departure``.
+
+        The running-time profile is chosen per edge from the time the train
+        reaches it, so a journey that crosses 10:00 switches from AM peak to
+        inter peak times part way.
+        """
+        source, target = self._station_ids(start_station, end_station)
+        path, minutes, self.settled = time_dependent_dijkstra(
+            self.adjacency, self.weights, profile_at, source, target, departure_minutes(departure))
+        if path is None:
+            return None, float('inf')
+        return [self.snapshot.stations[i] for i in path], minutes
+
+    def route_profile(self, start_station, end_station, profile):
+        """Return ``(best_route, minutes)`` using one profile for every edge."""
+        source, target = self._station_ids(start_station, end_station)
+        path, minutes, self.settled = time_dependent_dijkstra(
+            self.adjacency, self.weights, lambda t: profile, source, target, 0.0)
+        if path is None:
+            return None, float('inf')
+        return [self.snapshot.stations[i] for i in path], minutes
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from tube.snapshot import load_snapshot
+
+    parser = argparse.ArgumentParser(description='Fastest route for a departure time.')
+    parser.add_argument('start')
+    parser.add_argument('end')
+    parser.add_argument('--depart', default=None, help='HH:MM, defaults to now')
+    parser.add_argument('--zone', default='1')
+    args = parser.parse_args()
+
+    departure = args.depart or datetime.datetime.now()
+    try:
+        departure_minutes(departure)
+    except ValueError as error:
+        parser.error(str(error))
+    snapshot = load_snapshot(zone=args.zone)
+    router = TravelTimeRouter(snapshot)
+    try:
+        start, end = snapshot.names.resolve(args.start), snapshot.names.resolve(args.end)
+    except StationNotFound as error:
+        parser.exit(1, error.args[0] + '\n')
+    best_route, minutes = router.route(start, end, departure)
+    if best_route:
+        print(" -> ".join(best_route))
+        print(f"Travel time: {minutes:.1f} mins ({profile_at(departure_minutes(departure))} departure)")
+    else:
+        print(f"No path found from {start} to {end}")
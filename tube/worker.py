@@ -0,0 +1,71 @@
+"""Run GUI queries off the Tk main loop.
+
+Tk is not thread-safe, so the worker thread never touches widgets: finished
+jobs are put on a queue that the main loop drains with ``after``, and the
+callbacks run there. Only the newest job matters; submitting a new one or
+calling ``cancel`` makes any older result stale and it is dropped.
+"""
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+
+class BackgroundWorker:
+    def __init__(self, widget, poll_ms=50):
+        self.widget = widget
+        self.poll_ms = poll_ms
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._results = queue.Queue()
+        self._generation = 0
+        self._future = None
+        self._callbacks = None
+        self._polling = False
+
+    @property
+    def busy(self):
+        return self._future is not None
+
+    def submit(self, fn, *args, on_done, on_error=None):
+        """Run ``fn(*args)`` in the background, superseding any pending job."""
+        self.cancel()
+        generation = self._generation
+        self._callbacks = (on_done, on_error)
+        self._future = self._executor.submit(fn, *args)
+        self._future.add_done_callback(lambda future: self._results.put((generation, future)))
+        if not self._polling:
+            self._polling = True
+            self.widget.after(self.poll_ms, self._poll)
+
+    def cancel(self):
+        # A job that already started cannot be interrupted; its result is ignored.
+        self._generation += 1
+        if self._future is not None:
+            self._future.cancel()
+        self._future = None
+        self._callbacks = None
+
+    def _poll(self):
+        while True:
+            try:
+                generation, future = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if generation != self._generation or future.cancelled():
+                continue
+            on_done, on_error = self._callbacks
+            self._future = None
+            self._callbacks = None
+            error = future.exception()
+            if error is None:
+                on_done(future.result())
+            elif on_error is not None:
+                on_error(error)
+            else:
+                raise error
+        if self._future is not None:
+            self.widget.after(self.poll_ms, self._poll)
+        else:
+            self._polling = False
+
+    def shutdown(self):
+        self.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,72 @@
+"""Whole-network routing that loads zone partitions on demand.
+
+A snapshot built with ``zone='all'`` covers every station, grouped into
+zone partitions (see ``Snapshot.zone_members``). ``ZonedNetwork`` starts
+with nothing loaded; a query loads the zones of its two stations and the
+search pulls in any further zone the first time it reaches one of its
+stations. Most queries stay inside a few central zones, so outer zones are
+never materialised unless a route actually goes there.
+"""
+from tube.network import ALL_ZONES, StationNotFound
+from tube.search import bidirectional_dijkstra
+
+
+class LazyAdjacency:
+    """Adjacency lists that are filled in one zone partition at a time."""
+
+    def __init__(self, snapshot, weight=None):
+        self.snapshot = snapshot
+        self.weight = (snapshot.edge_distance if weight is None else weight)
+        self.station_zones = snapshot.station_zones()
+        self.loaded = set()
+        self._lists = {}
+
+    def load_zone(self, k):
+        if k in self.loaded:
+            return
+        snapshot = self.snapshot
+        indptr, indices, adj_edge, weight = snapshot.indptr, snapshot.indices, snapshot.adj_edge, self.weight
+        for u in snapshot.zone_stations[snapshot.zone_indptr[k]:snapshot.zone_indptr[k + 1]].tolist():
+            if u in self._lists:
+                continue
+            start, end = int(indptr[u]), int(indptr[u + 1])
+            self._lists[u] = list(zip(indices[start:end].tolist(), weight[adj_edge[start:end]].tolist()))
+        self.loaded.add(k)
+
+    def __getitem__(self, u):
+        if u not in self._lists:
+            self.load_zone(self.station_zones[u][0])
+        return self._lists[u]
+
+
+class ZonedNetwork:
+    """Route engine over the whole network with lazily loaded zones."""
+
+    def __init__(self, snapshot, graph=None):
+        self.snapshot = snapshot
+        self.adjacency = LazyAdjacency(snapshot)
+        self.settled = 0
+
+    @property
+    def loaded_zones(self):
+        return sorted(self.snapshot.zones[k] for k in self.adjacency.loaded)
+
+    def route(self, start_station, end_station):
+        station_id = self.snapshot.station_id
+        if start_station not in station_id or end_station not in station_id:
+            raise StationNotFound(f'{start_station} or {end_station} is not in the network')
+        source, target = station_id[start_station], station_id[end_station]
+        for station in (source, target):
+            for k in self.adjacency.station_zones[station]:
+                self.adjacency.load_zone(k)
+        path, distance, self.settled = bidirectional_dijkstra(self.adjacency, source, target)
+        if path is None:
+            return None, float('inf')
+        stations = self.snapshot.stations
+        return [stations[i] for i in path], distance
+
+
+def load_zoned_network(distance_file='distance.csv', coordinates_file='stations.csv'):
+    from tube.snapshot import load_snapshot
+
+    return ZonedNetwork(load_snapshot(distance_file, coordinates_file, ALL_ZONES))